@@ -0,0 +1,22 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Загрузки и миниатюры тестов - во временном каталоге."""
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_teardown(item):
+    """Ожидание фоновой генерации миниатюр до восстановления MEDIA_ROOT."""
+    from posts.thumbnails import worker
+    worker.join()
+
+
+def pytest_configure(config):
+    """Общий кеш тестов - в памяти процесса, как у manage.py test."""
+    from django.conf import settings
+
+    from core.test_runner import TEST_CACHES
+    settings.CACHES = TEST_CACHES
@@ -0,0 +1,62 @@
+import logging
+import queue
+import threading
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundQueue:
+    """Фоновые потоки, выполняющие задачи из локальной очереди процесса.
+
+    Задача - ключ и аргументы для handler(key, *args). Повторная
+    постановка ещё не обработанного ключа игнорируется. Потоки
+    запускаются при первой задаче; соединение с БД потока
+    закрывается после каждой задачи.
+    """
+
+    def __init__(self, name, handler, threads=1):
+        self.name = name
+        self.handler = handler
+        self.threads = threads
+        self.queue = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.workers = []
+
+    def submit(self, key, *args):
+        with self.lock:
+            if key in self.pending:
+                return
+            self.pending.add(key)
+            if not self.workers:
+                self._start()
+        self.queue.put((key, args))
+
+    def join(self):
+        """Ожидание обработки всей очереди (для тестов и команд)."""
+        self.queue.join()
+
+    def _start(self):
+        for number in range(self.threads):
+            worker = threading.Thread(
+                target=self._run, name=f'{self.name}-{number}', daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+
+    def _run(self):
+        while True:
+            key, args = self.queue.get()
+            try:
+                self.handler(key, *args)
+            except Exception:
+                logger.exception(
+                    'Фоновая задача %s %s не выполнена', self.name, key
+                )
+            finally:
+                connection.close()
+                with self.lock:
+                    self.pending.discard(key)
+                self.queue.task_done()
@@ -0,0 +1,167 @@
+import math
+import time
+import tracemalloc
+
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection, reset_queries
+from django.template.loader import render_to_string
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from posts.models import Group, Post, UserCounters
+from posts.paginators import page_links
+from yatube.settings import P_PER_L
+
+NAMESPACES = ('posts', 'users', 'about')
+METRICS = ('p50', 'p95', 'allocations')
+PAGINATOR_PAGES = (10, 1000, 100000, 10000000)
+PAGINATOR_TEMPLATE = 'includes/paginator.html'
+
+
+def named_routes():
+    """Имена маршрутов приложений и имена их параметров."""
+    resolver = get_resolver()
+    for namespace in NAMESPACES:
+        _, namespace_resolver = resolver.namespace_dict[namespace]
+        for pattern in namespace_resolver.url_patterns:
+            yield (
+                f'{namespace}:{pattern.name}',
+                list(pattern.pattern.converters),
+            )
+
+
+def sample_kwargs():
+    """Значения параметров маршрутов из самых «тяжёлых» объектов БД.
+
+    Автор - с наибольшим числом постов, группа - с наибольшим,
+    пост - с наибольшим числом комментариев, зритель - пользователь
+    с наибольшим числом подписок.
+    """
+    author = UserCounters.objects.order_by('-posts_count').first().user
+    viewer = UserCounters.objects.order_by('-following_count').first().user
+    group = Group.objects.order_by('-posts_count').first()
+    post = Post.objects.order_by('-comments_count').first()
+    return viewer, {
+        'username': author.username,
+        'slug': group.slug,
+        'post_id': post.pk,
+        'uidb64': urlsafe_base64_encode(force_bytes(viewer.pk)),
+        'token': default_token_generator.make_token(viewer),
+    }
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def measure(client, url, iterations, login):
+    """Запросы, задержки и пик памяти рендера страницы.
+
+    Перед каждым запросом кеш очищается: измеряется полный рендер,
+    а не чтение готовой страницы. Память считается отдельным
+    запросом под tracemalloc, чтобы не искажать задержки.
+    """
+    timings = []
+    queries = 0
+    status = None
+    for _ in range(iterations):
+        login()
+        cache.clear()
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            status = client.get(url).status_code
+            timings.append(time.perf_counter() - start)
+        queries = max(queries, len(captured))
+    login()
+    cache.clear()
+    tracemalloc.start()
+    try:
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'url': url,
+        'status': status,
+        'queries': queries,
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'allocations': peak,
+    }
+
+
+def run_benchmark(iterations=20):
+    """Замеры всех именованных маршрутов posts, users и about."""
+    viewer, kwargs = sample_kwargs()
+    results = {}
+    for name, params in named_routes():
+        url = reverse(name, kwargs={param: kwargs[param] for param in params})
+        client = Client()
+        results[name] = measure(
+            client, url, iterations, lambda: client.force_login(viewer)
+        )
+    return results
+
+
+def paginator_benchmark(page_counts=PAGINATOR_PAGES, iterations=20):
+    """Размер и время рендера навигации по страницам в середине ленты.
+
+    Лента - последовательность номеров вместо постов: шаблон навигации
+    зависит только от числа страниц, а БД для такой ленты не нужна.
+    """
+    results = {}
+    for pages in page_counts:
+        page_obj = Paginator(range(pages * P_PER_L), P_PER_L).page(
+            (pages + 1) // 2
+        )
+        page_obj.page_links = page_links(page_obj)
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            html = render_to_string(PAGINATOR_TEMPLATE, {'page_obj': page_obj})
+            timings.append(time.perf_counter() - start)
+        results[pages] = {
+            'bytes': len(html.encode()),
+            'links': html.count('<li'),
+            'p50': percentile(timings, 50),
+        }
+    return results
+
+
+def compare(results, baseline, tolerance, query_tolerance=0):
+    """Регрессии относительно сохранённых замеров.
+
+    Число запросов может вырасти не больше чем на query_tolerance,
+    задержки и память - не больше чем в (1 + tolerance) раз.
+    Маршруты, которых нет в базовой линии, не сравниваются.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if metrics['status'] != base['status']:
+            regressions.append(
+                f'{name}: статус {metrics["status"]} вместо {base["status"]}'
+            )
+        if metrics['queries'] > base['queries'] + query_tolerance:
+            regressions.append(
+                f'{name}: запросов {metrics["queries"]} '
+                f'вместо {base["queries"]}'
+            )
+        for metric in METRICS:
+            if metrics[metric] > base[metric] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: {metric} {metrics[metric]:.4g} '
+                    f'вместо {base[metric]:.4g}'
+                )
+    return regressions
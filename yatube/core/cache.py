@@ -0,0 +1,239 @@
+import pickle
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import record_cache
+
+LOCK_KEY = 'lock:{}'
+
+# Экземпляры бэкенда у Django свои в каждом потоке, а счётчики
+# по префиксам ключей общие для процесса (по алиасу L2).
+_metrics = defaultdict(lambda: defaultdict(Counter))
+_metrics_lock = threading.Lock()
+
+# L1, как и LocMemCache, общий для всех потоков процесса (по LOCATION):
+# {ключ: (pickle значения, срок)}, размер значений в байтах и блокировка.
+_l1_caches = {}
+_l1_sizes = defaultdict(int)
+_l1_locks = {}
+
+
+def key_prefix(key):
+    """Префикс ключа для метрик: 'page:...' -> 'page'."""
+    return re.split('[:.|]', key, 1)[0]
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кеш: L1 LRU в процессе + L2 общий кеш.
+
+    L2 - любой настроенный алиас из CACHES (файловый кеш, memcached,
+    в тестах LocMemCache). L1 ускоряет повторные чтения в пределах
+    процесса: он общий для всех потоков (экземпляров бэкенда с одним
+    LOCATION), ограничен L1_MAX_ENTRIES ключами и L1_MAX_BYTES байтами
+    значений и хранит их не дольше L1_TIMEOUT секунд. Ключи
+    с префиксами из L1_BYPASS_PREFIXES (счётчики поколений) всегда
+    читаются из L2, иначе инвалидация из другого процесса была бы
+    видна с опозданием.
+
+    Параметры OPTIONS: SHARED, L1_MAX_ENTRIES, L1_MAX_BYTES, L1_TIMEOUT,
+    L1_BYPASS_PREFIXES, LOCK_TIMEOUT.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self._l1_max_bytes = options.get('L1_MAX_BYTES', 16 * 1024 * 1024)
+        self._l1_timeout = options.get('L1_TIMEOUT', 60)
+        self._l1_bypass = tuple(options.get('L1_BYPASS_PREFIXES', ()))
+        self._lock_timeout = options.get('LOCK_TIMEOUT', 5)
+        self._l1_name = location
+        self._l1 = _l1_caches.setdefault(location, OrderedDict())
+        self._l1_lock = _l1_locks.setdefault(location, threading.Lock())
+        self._metrics = _metrics[self._shared_alias]
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _use_l1(self, key):
+        return not key.startswith(self._l1_bypass)
+
+    def _l1_get(self, key, version):
+        l1_key = self.make_key(key, version)
+        with self._l1_lock:
+            entry = self._l1.get(l1_key)
+            if entry is None:
+                return None
+            pickled, expires = entry
+            if expires < time.monotonic():
+                self._l1_pop(l1_key)
+                return None
+            self._l1.move_to_end(l1_key)
+        return pickle.loads(pickled)
+
+    def _l1_set(self, key, value, timeout, version):
+        if not self._use_l1(key):
+            return
+        l1_timeout = self._l1_timeout
+        if timeout is not None and timeout != DEFAULT_TIMEOUT:
+            l1_timeout = min(timeout, l1_timeout)
+        if l1_timeout <= 0:
+            self._l1_delete(key, version)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(pickled) > self._l1_max_bytes:
+            self._l1_delete(key, version)
+            return
+        l1_key = self.make_key(key, version)
+        with self._l1_lock:
+            self._l1_pop(l1_key)
+            self._l1[l1_key] = (pickled, time.monotonic() + l1_timeout)
+            _l1_sizes[self._l1_name] += len(pickled)
+            while (len(self._l1) > self._l1_max_entries
+                   or _l1_sizes[self._l1_name] > self._l1_max_bytes):
+                self._l1_pop(next(iter(self._l1)))
+
+    def _l1_pop(self, l1_key):
+        """Удаление ключа из L1; вызывается под self._l1_lock."""
+        entry = self._l1.pop(l1_key, None)
+        if entry is not None:
+            _l1_sizes[self._l1_name] -= len(entry[0])
+
+    def _l1_delete(self, key, version):
+        with self._l1_lock:
+            self._l1_pop(self.make_key(key, version))
+
+    def _record(self, key, event):
+        with _metrics_lock:
+            self._metrics[key_prefix(key)][event] += 1
+        record_cache(event)
+
+    def metrics(self):
+        """Попадания и промахи по префиксам ключей во всех потоках процесса."""
+        with _metrics_lock:
+            return {
+                prefix: dict(counter)
+                for prefix, counter in self._metrics.items()
+            }
+
+    def reset_metrics(self):
+        with _metrics_lock:
+            self._metrics.clear()
+
+    def get(self, key, default=None, version=None):
+        if self._use_l1(key):
+            value = self._l1_get(key, version)
+            if value is not None:
+                self._record(key, 'l1_hits')
+                return value
+        value = self.shared.get(key, version=version)
+        if value is None:
+            self._record(key, 'misses')
+            return default
+        self._record(key, 'hits')
+        self._l1_set(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for key in keys:
+            if self._use_l1(key):
+                value = self._l1_get(key, version)
+                if value is not None:
+                    self._record(key, 'l1_hits')
+                    found[key] = value
+        rest = [key for key in keys if key not in found]
+        shared = self.shared.get_many(rest, version=version) if rest else {}
+        for key in rest:
+            if key in shared:
+                self._record(key, 'hits')
+                self._l1_set(key, shared[key], DEFAULT_TIMEOUT, version)
+            else:
+                self._record(key, 'misses')
+        found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._l1_set(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._l1_set(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(key, version)
+        self.shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(key, version)
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        with self._l1_lock:
+            self._l1.clear()
+            _l1_sizes[self._l1_name] = 0
+        self.shared.clear()
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """get_or_set с защитой от эффекта «стада» (cache stampede).
+
+        При промахе значение вычисляет только процесс, захвативший
+        блокировку в L2; остальные ждут его результат, пока блокировка
+        жива (не дольше LOCK_TIMEOUT секунд), и лишь затем считают сами.
+        Блокировка - cache.add в L2: между процессами она надёжна только
+        на бэкендах с атомарным add (Memcached, Redis). У FileBasedCache
+        add не атомарен, и изредка значение вычислят несколько процессов.
+        """
+        if not callable(default):
+            return super().get_or_set(key, default, timeout, version)
+        value = self.get(key, version=version)
+        if value is not None:
+            return value
+        lock_key = LOCK_KEY.format(key)
+        if self.shared.add(lock_key, 1, self._lock_timeout, version=version):
+            try:
+                return self._compute(key, default, timeout, version)
+            finally:
+                self.shared.delete(lock_key, version=version)
+        deadline = time.monotonic() + self._lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = self.shared.get(key, version=version)
+            if value is not None:
+                self._record(key, 'lock_waits')
+                self._l1_set(key, value, timeout, version)
+                return value
+            if not self.shared.has_key(lock_key, version=version):
+                break
+        return self._compute(key, default, timeout, version)
+
+    def _compute(self, key, default, timeout, version):
+        value = default()
+        if value is not None:
+            self.set(key, value, timeout, version)
+        return value
+
+
+def cache_metrics():
+    """Метрики всех TieredCache из CACHES: {алиас: metrics()}."""
+    return {
+        alias: caches[alias].metrics() for alias in settings.CACHES
+        if isinstance(caches[alias], TieredCache)
+    }
@@ -0,0 +1,59 @@
+import base64
+import json
+import re
+from functools import wraps
+
+from django.template.loader import render_to_string
+
+HOLE_MARKER = '<!--hole:{}:{}-->'
+HOLE_PATTERN = re.compile(r'<!--hole:([\w/.-]+\.html):([\w=-]*)-->')
+
+
+def hole_marker(template_name, params):
+    """Метка дыры: шаблон и его параметры (JSON в base64)."""
+    encoded = base64.urlsafe_b64encode(
+        json.dumps(params, separators=(',', ':')).encode()
+    ).decode()
+    return HOLE_MARKER.format(template_name, encoded)
+
+
+def fill_holes(request, content, context=None):
+    """Рендер меток дыр в content для пользователя запроса.
+
+    Метки попадают в страницу только из шаблонов (тег hole):
+    пользовательский текст экранируется, подделать метку нельзя.
+    """
+    def render(match):
+        template_name, encoded = match.groups()
+        params = json.loads(base64.urlsafe_b64decode(encoded))
+        return render_to_string(
+            template_name, {**(context or {}), **params}, request=request
+        )
+    return HOLE_PATTERN.sub(render, content)
+
+
+def punch_holes(context=None):
+    """Страница с дырами: общий для всех рендер плюс персональные части.
+
+    Пока представление работает, тег hole выводит вместо
+    персональных фрагментов метки, поэтому его ответ одинаков для
+    всех пользователей и кешируется целиком. Метки заполняются
+    при каждом ответе; context(request) - общий контекст фрагментов.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            request.punch_holes = True
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                request.punch_holes = False
+            if response.status_code != 200 or response.streaming:
+                return response
+            extra = context(request) if context else None
+            response.content = fill_holes(
+                request, response.content.decode(response.charset), extra
+            )
+            return response
+        return wrapper
+    return decorator
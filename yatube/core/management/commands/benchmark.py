@@ -0,0 +1,124 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from core.benchmark import compare, paginator_benchmark, run_benchmark
+from posts.models import Post
+from posts.seed import Seeder
+from yatube.settings import BASE_DIR
+
+BASELINE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+DATABASE = os.path.join(BASE_DIR, 'benchmark.sqlite3')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер запросов к БД, задержек и памяти всех страниц на '
+        'синтетических данных и сравнение с базовой линией'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=200000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--iterations', type=int, default=20,
+            help='Число замеров каждой страницы',
+        )
+        parser.add_argument(
+            '--baseline', default=BASELINE,
+            help='JSON-файл с базовой линией',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый рост задержек и памяти (доля)',
+        )
+        parser.add_argument(
+            '--query-tolerance', type=int, default=0,
+            help='Допустимый рост числа запросов',
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Записать результаты как новую базовую линию',
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Сохранить БД с данными для следующих запусков',
+        )
+        parser.add_argument(
+            '--paginator', action='store_true',
+            help='Замерить только навигацию по страницам при росте лент',
+        )
+
+    def handle(self, *args, **options):
+        if options['paginator']:
+            self.report_paginator(
+                paginator_benchmark(iterations=options['iterations'])
+            )
+            return
+        connection.settings_dict['TEST']['NAME'] = DATABASE
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        try:
+            if not Post.objects.exists():
+                self.stdout.write('Генерация данных...')
+                Seeder(options['seed']).run(
+                    options['users'], options['groups'], options['posts'],
+                    options['comments'], options['follows'],
+                )
+            results = run_benchmark(options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+        self.report(results)
+        self.check_baseline(results, options)
+
+    def report(self, results):
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:40} {metrics["status"]} '
+                f'запросов {metrics["queries"]:4} '
+                f'p50 {metrics["p50"] * 1000:8.1f} мс '
+                f'p95 {metrics["p95"] * 1000:8.1f} мс '
+                f'память {metrics["allocations"] / 1024:8.0f} КБ'
+            )
+
+    def report_paginator(self, results):
+        for pages, metrics in results.items():
+            self.stdout.write(
+                f'страниц {pages:>10} '
+                f'ссылок {metrics["links"]:3} '
+                f'размер {metrics["bytes"]:6} Б '
+                f'p50 {metrics["p50"] * 1000:8.3f} мс'
+            )
+
+    def check_baseline(self, results, options):
+        path = options['baseline']
+        if options['update_baseline'] or not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as baseline:
+                json.dump(results, baseline, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовая линия записана в {path}'
+            ))
+            return
+        with open(path, encoding='utf-8') as baseline:
+            regressions = compare(
+                results, json.load(baseline),
+                options['tolerance'], options['query_tolerance'],
+            )
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(regression))
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
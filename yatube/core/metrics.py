@@ -0,0 +1,215 @@
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+from django.template.backends.django import DjangoTemplates, Template
+
+from yatube.settings import METRICS_SAMPLE_RATE
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Имя метрики, атрибут RequestStats, границы корзин, описание
+HISTOGRAMS = (
+    ('yatube_request_duration_seconds', 'duration', SECONDS_BUCKETS,
+     'Время обработки запроса'),
+    ('yatube_db_queries', 'queries', QUERIES_BUCKETS,
+     'Число запросов к БД за запрос'),
+    ('yatube_db_duration_seconds', 'db_time', SECONDS_BUCKETS,
+     'Время запросов к БД за запрос'),
+    ('yatube_template_render_seconds', 'render_time', SECONDS_BUCKETS,
+     'Время рендера шаблонов (включая ленивые запросы к БД)'),
+)
+CACHE_COUNTER = 'yatube_cache_events_total'
+CACHE_PREFIX_COUNTER = 'yatube_cache_prefix_events_total'
+UNRESOLVED = '<unresolved>'
+
+_local = threading.local()
+
+
+class Histogram:
+    """Гистограмма Prometheus: число значений не больше каждой границы."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestStats:
+    """Замеры одного запроса; заодно обёртка выполнения SQL."""
+
+    def __init__(self):
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_depth = 0
+        self.cache = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+class Registry:
+    """Гистограммы и счётчики по представлениям в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._cache_events = Counter()
+
+    def observe(self, view, stats):
+        with self._lock:
+            for name, attribute, buckets, _ in HISTOGRAMS:
+                histogram = self._histograms.get((name, view))
+                if histogram is None:
+                    histogram = self._histograms[name, view] = Histogram(
+                        buckets
+                    )
+                histogram.observe(getattr(stats, attribute))
+            for event, count in stats.cache.items():
+                self._cache_events[view, event] += count
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._cache_events.clear()
+
+    def render(self, cache_prefixes=None):
+        """Текстовый формат экспозиции Prometheus 0.0.4.
+
+        cache_prefixes - счётчики TieredCache по префиксам ключей
+        {алиас: {префикс: {событие: число}}}, см. core.cache.cache_metrics.
+        """
+        lines = []
+        with self._lock:
+            for name, _, _, description in HISTOGRAMS:
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view), histogram in sorted(
+                    self._histograms.items()
+                ):
+                    if metric == name:
+                        lines.extend(histogram_lines(name, view, histogram))
+            lines.append(f'# HELP {CACHE_COUNTER} Обращения к кешу')
+            lines.append(f'# TYPE {CACHE_COUNTER} counter')
+            for (view, event), count in sorted(self._cache_events.items()):
+                lines.append(
+                    f'{CACHE_COUNTER}{{view="{label(view)}",'
+                    f'event="{event}"}} {count}'
+                )
+        if cache_prefixes is not None:
+            lines.extend(cache_prefix_lines(cache_prefixes))
+        return '\n'.join(lines) + '\n'
+
+
+def label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def cache_prefix_lines(cache_prefixes):
+    yield (
+        f'# HELP {CACHE_PREFIX_COUNTER} '
+        f'Обращения к кешу по префиксам ключей (все запросы процесса)'
+    )
+    yield f'# TYPE {CACHE_PREFIX_COUNTER} counter'
+    for alias, prefixes in sorted(cache_prefixes.items()):
+        for prefix, events in sorted(prefixes.items()):
+            for event, count in sorted(events.items()):
+                yield (
+                    f'{CACHE_PREFIX_COUNTER}{{cache="{label(alias)}",'
+                    f'prefix="{label(prefix)}",event="{event}"}} {count}'
+                )
+
+
+def histogram_lines(name, view, histogram):
+    view = label(view)
+    for bound, total in histogram.cumulative():
+        yield f'{name}_bucket{{view="{view}",le="{bound}"}} {total}'
+    yield f'{name}_sum{{view="{view}"}} {histogram.sum}'
+    yield f'{name}_count{{view="{view}"}} {histogram.count}'
+
+
+registry = Registry()
+
+
+def current():
+    """Замеры текущего запроса или None, если он не в выборке."""
+    return getattr(_local, 'stats', None)
+
+
+def sampled():
+    rate = METRICS_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def record_cache(event):
+    stats = current()
+    if stats is not None:
+        stats.cache[event] += 1
+
+
+@contextmanager
+def collect():
+    """Сбор замеров запроса в этом потоке."""
+    stats = RequestStats()
+    _local.stats = stats
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(stats):
+            yield stats
+    finally:
+        stats.duration = time.perf_counter() - start
+        _local.stats = None
+
+
+class TimedTemplate(Template):
+    """Шаблон, который учитывает время рендера в замерах запроса.
+
+    Шаблоны, отрисованные изнутри другого (render_to_string
+    во фрагментах), не считаются второй раз.
+    """
+
+    def render(self, context=None, request=None):
+        stats = current()
+        if stats is None or stats.render_depth:
+            return super().render(context, request)
+        stats.render_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.render_depth -= 1
+            stats.render_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django с замером времени рендера."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -0,0 +1,51 @@
+import time
+
+from . import metrics, profiling
+
+
+class MetricsMiddleware:
+    """Замеры времени, запросов к БД, кеша и рендера по представлениям.
+
+    Стоит первым в MIDDLEWARE, чтобы учесть работу остальных.
+    Замеряется доля METRICS_SAMPLE_RATE запросов; при нуле
+    middleware только передаёт запрос дальше.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.sampled():
+            return self.get_response(request)
+        with metrics.collect() as stats:
+            response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match else metrics.UNRESOLVED
+        metrics.registry.observe(view, stats)
+        return response
+
+
+class ProfilingMiddleware:
+    """Профиль стеков для медленных запросов.
+
+    Профилируются запросы с заголовком X-Profile, равным
+    PROFILING_TOKEN, и доля PROFILING_SAMPLE_RATE остальных.
+    Профиль сохраняется, только если запрос шёл не меньше
+    PROFILING_THRESHOLD секунд.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.requested(request):
+            return self.get_response(request)
+        start = time.perf_counter()
+        with profiling.StackSampler() as sampler:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        if profiling.is_slow(duration) and sampler.stacks:
+            match = request.resolver_match
+            label = match.view_name if match else request.path
+            profiling.save_profile(sampler.stacks, label, duration)
+        return response
@@ -0,0 +1,99 @@
+import os
+import random
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+
+from django.utils.crypto import constant_time_compare
+
+from yatube.settings import (PROFILING_DIR, PROFILING_INTERVAL,
+                             PROFILING_MAX_FILES, PROFILING_SAMPLE_RATE,
+                             PROFILING_THRESHOLD, PROFILING_TOKEN)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+SUFFIX = '.folded'
+
+
+def frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}:{code.co_name}:{code.co_firstlineno}'
+
+
+def collapse(frame):
+    """Стек в формате flamegraph: кадры от корня через ';'."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Снимки стека одного потока по таймеру из фонового потока.
+
+    В отличие от cProfile не замедляет каждый вызов функции:
+    накладные расходы - один снимок стека раз в interval секунд.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval or PROFILING_INTERVAL
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def requested(request):
+    """Профилировать ли запрос: по заголовку с токеном или по выборке."""
+    token = request.META.get(PROFILE_HEADER)
+    if token and PROFILING_TOKEN and constant_time_compare(
+            token, PROFILING_TOKEN
+    ):
+        return True
+    rate = PROFILING_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def is_slow(duration):
+    return duration >= PROFILING_THRESHOLD
+
+
+def save_profile(stacks, label, duration):
+    """Запись стеков в PROFILING_DIR, старые файлы сверх лимита удаляются."""
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    label = re.sub(r'[^\w.-]+', '_', label).strip('_')
+    name = (
+        f'{datetime.now():%Y%m%dT%H%M%S%f}-{label}-'
+        f'{duration * 1000:.0f}ms{SUFFIX}'
+    )
+    path = os.path.join(PROFILING_DIR, name)
+    with open(path, 'w', encoding='utf-8') as output:
+        for stack, count in sorted(stacks.items(), key=lambda x: -x[1]):
+            output.write(f'{stack} {count}\n')
+    rotate()
+    return path
+
+
+def rotate():
+    profiles = sorted(
+        name for name in os.listdir(PROFILING_DIR) if name.endswith(SUFFIX)
+    )
+    for name in profiles[:-PROFILING_MAX_FILES or None]:
+        os.remove(os.path.join(PROFILING_DIR, name))
@@ -1,6 +1,26 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
 from http import HTTPStatus
+from unittest.mock import patch
 
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+
+from posts.models import Post, User
+from posts.seed import Seeder
+
+from .background import BackgroundQueue
+from .benchmark import (compare, named_routes, paginator_benchmark,
+                        run_benchmark)
+from .cache import TieredCache
+from .metrics import registry
+from .profiling import StackSampler, save_profile
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +28,271 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        self.cache = TieredCache('tiered-tests', {
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'L1_MAX_ENTRIES': 2,
+                'L1_MAX_BYTES': 1024,
+                'L1_BYPASS_PREFIXES': ('generation:',),
+            },
+        })
+        self.shared = caches['shared']
+        self.cache.clear()
+        self.cache.reset_metrics()
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def test_l1_serves_repeated_reads_and_evicts_lru(self):
+        """Повторное чтение из L1, вытеснение давно не читанных ключей."""
+        self.cache.set('page:1', 'первая')
+        self.cache.set('page:2', 'вторая')
+        self.assertEqual(self.cache.get('page:1'), 'первая')
+        self.cache.set('page:3', 'третья')
+        self.shared.delete('page:1')
+        self.shared.delete('page:2')
+        self.assertEqual(self.cache.get('page:1'), 'первая')
+        self.assertIsNone(self.cache.get('page:2'))
+        self.assertEqual(
+            self.cache.metrics()['page'], {'l1_hits': 2, 'misses': 1}
+        )
+
+    def test_l1_is_shared_between_threads_and_bounded_by_bytes(self):
+        """L1 общий для потоков процесса и не больше L1_MAX_BYTES."""
+        self.cache.set('page:1', 'первая')
+        self.shared.delete('page:1')
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            TieredCache('tiered-tests', {
+                'OPTIONS': {'SHARED': 'shared'},
+            }).get('page:1')
+        ))
+        thread.start()
+        thread.join()
+        self.assertEqual(results, ['первая'])
+        self.cache.set('page:big', 'x' * 2000)
+        self.shared.delete('page:big')
+        self.assertIsNone(self.cache.get('page:big'))
+        self.cache.set('page:2', 'y' * 600)
+        self.cache.set('page:3', 'z' * 600)
+        self.shared.delete('page:2')
+        self.assertIsNone(self.cache.get('page:2'))
+
+    def test_bypass_prefixes_always_read_shared(self):
+        """Счётчики поколений не кешируются в L1."""
+        self.cache.set('generation:global', 1)
+        self.shared.incr('generation:global')
+        self.assertEqual(self.cache.get('generation:global'), 2)
+        self.assertEqual(
+            self.cache.metrics()['generation'], {'hits': 1}
+        )
+
+    def test_get_or_set_computes_once_under_concurrency(self):
+        """Защита от stampede: значение вычисляет один поток."""
+        calls = []
+        started = threading.Event()
+
+        def slow_default():
+            calls.append(1)
+            started.wait(1)
+            return 'значение'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                self.cache.get_or_set('page:slow', slow_default, None)
+            ))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['значение'] * 5)
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Seeder(seed=1, batch_size=10).run(
+            users=10, groups=2, posts=30, comments=20, follows=15
+        )
+
+    def test_benchmark_covers_all_routes(self):
+        """Замеры всех маршрутов posts, users и about без ошибок."""
+        results = run_benchmark(iterations=2)
+        self.assertEqual(
+            set(results), {name for name, _ in named_routes()}
+        )
+        for name, metrics in results.items():
+            with self.subTest(name=name):
+                self.assertLess(metrics['status'], 500)
+                if metrics['status'] != HTTPStatus.METHOD_NOT_ALLOWED:
+                    self.assertGreater(metrics['queries'], 0)
+                self.assertLessEqual(metrics['p50'], metrics['p95'])
+        self.assertEqual(compare(results, results, tolerance=0), [])
+
+    def test_paginator_benchmark_is_flat(self):
+        """Навигация не растёт с числом страниц ленты."""
+        results = paginator_benchmark((100, 1000000), iterations=1)
+        small, large = results[100], results[1000000]
+        self.assertEqual(small['links'], large['links'])
+        self.assertLess(large['bytes'], small['bytes'] * 1.2)
+
+    def test_compare_reports_regressions(self):
+        """Рост числа запросов и задержки сверх допуска - регрессия."""
+        base = {
+            'posts:index': {
+                'status': 200, 'queries': 3,
+                'p50': 0.01, 'p95': 0.02, 'allocations': 1000,
+            },
+        }
+        current = {'posts:index': dict(base['posts:index'], queries=30)}
+        current['posts:index']['p95'] = 0.024
+        self.assertEqual(compare(current, base, tolerance=0.25), [
+            'posts:index: запросов 30 вместо 3',
+        ])
+        self.assertEqual(len(compare(current, base, tolerance=0.1)), 2)
+
+
+class BackgroundQueueTests(TestCase):
+    def test_pending_key_is_not_queued_twice(self):
+        """Ключ, ещё стоящий в очереди, второй раз не ставится."""
+        release = threading.Event()
+        done = []
+
+        def handler(key, value):
+            release.wait(5)
+            done.append((key, value))
+
+        background = BackgroundQueue('test-queue', handler)
+        background.submit('a', 1)
+        background.submit('a', 2)
+        background.submit('b', 3)
+        release.set()
+        background.join()
+        self.assertEqual(done, [('a', 1), ('b', 3)])
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Viewer')
+        cls.admin = User.objects.create_user(username='Admin', is_staff=True)
+        Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_sampled_requests_are_recorded(self):
+        """Замеры страницы попадают в гистограммы её представления."""
+        with patch('core.metrics.METRICS_SAMPLE_RATE', 1):
+            self.client.get(reverse('posts:index'))
+            self.client.get(reverse('posts:index'))
+        text = registry.render()
+        view = 'view="posts:index"'
+        expected = (
+            f'yatube_request_duration_seconds_count{{{view}}} 2',
+            f'yatube_db_queries_bucket{{{view},le="+Inf"}} 2',
+            f'yatube_template_render_seconds_sum{{{view}}}',
+            f'yatube_cache_events_total{{{view},event="misses"}}',
+        )
+        for line in expected:
+            self.assertIn(line, text)
+        self.assertNotIn(f'yatube_db_queries_bucket{{{view},le="0"}} 2', text)
+
+    def test_sampling_off_records_nothing(self):
+        """При нулевой доле выборки ничего не замеряется."""
+        with patch('core.metrics.METRICS_SAMPLE_RATE', 0):
+            self.client.get(reverse('posts:index'))
+        self.assertNotIn('posts:index', registry.render())
+
+    def test_metrics_endpoint_is_staff_only(self):
+        """Метрики в формате Prometheus доступны только персоналу."""
+        url = reverse('metrics')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.FOUND)
+        self.client.force_login(self.admin)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(
+            response, '# TYPE yatube_request_duration_seconds histogram'
+        )
+
+    def test_metrics_endpoint_exports_cache_prefixes(self):
+        """Попадания и промахи TieredCache по префиксам ключей."""
+        caches['default'].reset_metrics()
+        cache.get('page:missing')
+        self.client.force_login(self.admin)
+        self.assertContains(
+            self.client.get(reverse('metrics')),
+            'yatube_cache_prefix_events_total'
+            '{cache="default",prefix="page",event="misses"} 1',
+        )
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def slow_view(request):
+    busy_wait(float(request.GET.get('seconds', 0.05)))
+    return HttpResponse()
+
+
+urlpatterns = [path('slow/', slow_view, name='slow')]
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        patcher = patch('core.profiling.PROFILING_DIR', self.directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sampler_collects_collapsed_stacks(self):
+        """Стеки снимаются от корня к текущей функции."""
+        with StackSampler(interval=0.001) as sampler:
+            busy_wait(0.05)
+        self.assertTrue(sampler.stacks)
+        stack = sampler.stacks.most_common(1)[0][0]
+        self.assertIn(';core.tests:busy_wait:', stack)
+
+    def test_save_profile_rotates_files(self):
+        """Хранятся только последние PROFILING_MAX_FILES профилей."""
+        with patch('core.profiling.PROFILING_MAX_FILES', 2):
+            paths = [
+                save_profile({'a;b': number + 1}, 'posts:index', 0.6)
+                for number in range(3)
+            ]
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            [os.path.basename(path) for path in paths[1:]],
+        )
+        with open(paths[-1], encoding='utf-8') as profile:
+            self.assertEqual(profile.read(), 'a;b 3\n')
+
+    @override_settings(ROOT_URLCONF='core.tests')
+    def test_only_slow_requests_with_token_are_saved(self):
+        """Профиль пишется по заголовку с токеном и выше порога."""
+        url = reverse('slow')
+        with patch('core.profiling.PROFILING_TOKEN', 'secret'), \
+                patch('core.profiling.PROFILING_THRESHOLD', 0.01):
+            self.client.get(url, HTTP_X_PROFILE='wrong')
+            self.assertEqual(os.listdir(self.directory), [])
+            self.client.get(url, HTTP_X_PROFILE='secret')
+            self.client.get(url, {'seconds': 0}, HTTP_X_PROFILE='secret')
+        profiles = os.listdir(self.directory)
+        self.assertEqual(len(profiles), 1)
+        self.assertIn('-slow-', profiles[0])
@@ -1,5 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from .cache import cache_metrics
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     template = 'core/404.html'
@@ -22,3 +27,11 @@ def permission_denied(request, exception):
 def csrf_failure(request, reason=''):
     template = 'core/403csrf.html'
     return render(request, template)
+
+
+@staff_member_required
+def metrics(request):
+    return HttpResponse(
+        registry.render(cache_metrics()),
+        content_type='text/plain; version=0.0.4',
+    )
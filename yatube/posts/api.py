@@ -0,0 +1,208 @@
+import json
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST, require_safe
+
+from yatube.settings import COMMENTS_PER_PAGE, P_PER_L
+
+from .cache import (GLOBAL_SCOPE, TIMELINES_SCOPE, author_scope,
+                    generation_cache_page, group_scope, timeline_scope,
+                    versioned)
+from .follows import follow, following_ids, unfollow
+from .models import Comment, Group, Post, User, UserCounters
+from .paginators import CursorPaginator
+from .timeline import timeline_posts
+from .views import post_page_scopes
+
+POST_FIELDS = (
+    'id',
+    'text',
+    'pub_date',
+    'image',
+    'comments_count',
+    'author__username',
+    'group__slug',
+)
+COMMENT_FIELDS = ('id', 'text', 'created', 'author__username')
+MAX_BULK_FOLLOW = 100
+
+
+def image_url(request, name):
+    if not name:
+        return None
+    return request.build_absolute_uri(default_storage.url(name))
+
+
+def serialize_post(request, row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': image_url(request, row['image']),
+        'comments_count': row['comments_count'],
+    }
+
+
+def serialize_comment(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'created': row['created'],
+        'author': row['author__username'],
+    }
+
+
+def error(message, status):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def feed_response(request, posts):
+    page = CursorPaginator(posts.values(*POST_FIELDS), P_PER_L).get_page(
+        request.GET.get('cursor')
+    )
+    return JsonResponse({
+        'results': [serialize_post(request, row) for row in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+def followed_scopes(request):
+    """Области ленты подписок: поколение ленты user и популярные авторы.
+
+    Поколение ленты сдвигают подписки, отписки и изменения постов
+    авторов с раскладкой; посты популярных авторов подмешиваются
+    при чтении, и их изменения видны по author_scope.
+    TIMELINES_SCOPE - редкие изменения сразу всех лент (имена
+    авторов и групп).
+    """
+    if not request.user.is_authenticated:
+        return []
+    popular = UserCounters.objects.filter(
+        user__following__user=request.user, fanout=False
+    ).values_list('user__username', flat=True)
+    return [
+        TIMELINES_SCOPE, timeline_scope(request.user.pk),
+        *(author_scope(username) for username in popular),
+    ]
+
+
+@require_safe
+@versioned(lambda request: [GLOBAL_SCOPE])
+@generation_cache_page(GLOBAL_SCOPE, parameters=('cursor',))
+def index(request):
+    """Лента всех постов."""
+    return feed_response(request, Post.objects.all())
+
+
+@require_safe
+@versioned(lambda request, slug: [group_scope(slug)])
+@generation_cache_page(group_scope('{slug}'), parameters=('cursor',))
+def group_posts(request, slug):
+    """Лента постов сообщества."""
+    group = Group.objects.filter(slug=slug).values('pk').first()
+    if group is None:
+        return error('Сообщество не найдено', 404)
+    return feed_response(request, Post.objects.filter(group_id=group['pk']))
+
+
+@require_safe
+@versioned(lambda request, username: [author_scope(username)])
+@generation_cache_page(author_scope('{username}'), parameters=('cursor',))
+def profile(request, username):
+    """Лента постов автора."""
+    user = User.objects.filter(username=username).values('pk').first()
+    if user is None:
+        return error('Пользователь не найден', 404)
+    return feed_response(request, Post.objects.filter(author_id=user['pk']))
+
+
+@require_safe
+@versioned(followed_scopes)
+def follow_index(request):
+    """Лента подписок текущего пользователя."""
+    if not request.user.is_authenticated:
+        return error('Требуется авторизация', 401)
+    return feed_response(request, timeline_posts(request.user))
+
+
+@require_safe
+@versioned(post_page_scopes)
+def post_detail(request, post_id):
+    """Пост со страницей комментариев (курсор - как у лент)."""
+    post = Post.objects.filter(pk=post_id).values(*POST_FIELDS).first()
+    if post is None:
+        return error('Пост не найден', 404)
+    comments = Comment.objects.filter(post_id=post_id).order_by(
+        '-created', '-pk'
+    ).values(*COMMENT_FIELDS)
+    page = CursorPaginator(comments, COMMENTS_PER_PAGE).get_page(
+        request.GET.get('cursor')
+    )
+    data = serialize_post(request, post)
+    data['comments'] = [serialize_comment(row) for row in page]
+    data['next_cursor'] = page.next_cursor
+    data['previous_cursor'] = page.previous_cursor
+    return JsonResponse(data)
+
+
+def parse_usernames(body):
+    """Списки имён из тела {"follow": [...], "unfollow": [...]}.
+
+    None, если тело не JSON такого вида.
+    """
+    try:
+        data = json.loads(body)
+        lists = [data.get(key, []) for key in ('follow', 'unfollow')]
+    except (ValueError, AttributeError):
+        return None
+    if not all(
+        isinstance(names, list)
+        and all(isinstance(name, str) for name in names)
+        for names in lists
+    ):
+        return None
+    return lists
+
+
+@require_POST
+def follow_bulk(request):
+    """Подписка и отписка на многих авторов одним запросом.
+
+    Авторы ищутся одним запросом, уже выполненные действия
+    пропускаются по кешированному множеству подписок.
+    """
+    if not request.user.is_authenticated:
+        return error('Требуется авторизация', 401)
+    lists = parse_usernames(request.body)
+    if lists is None:
+        return error('Ожидается JSON с полями follow и unfollow', 400)
+    to_follow, to_unfollow = lists
+    if len(to_follow) + len(to_unfollow) > MAX_BULK_FOLLOW:
+        return error(f'Не больше {MAX_BULK_FOLLOW} имён за запрос', 400)
+    authors = {
+        author.username: author for author in User.objects.filter(
+            username__in=set(to_follow + to_unfollow)
+        ).only('pk', 'username')
+    }
+    following = following_ids(request.user.pk)
+    with transaction.atomic():
+        followed = [
+            name for name in dict.fromkeys(to_follow)
+            if name in authors and authors[name].pk not in following
+            and follow(request.user, authors[name])
+        ]
+        unfollowed = [
+            name for name in dict.fromkeys(to_unfollow)
+            if name in authors and authors[name].pk in following
+            and unfollow(request.user, authors[name])
+        ]
+    return JsonResponse({
+        'followed': followed,
+        'unfollowed': unfollowed,
+        'not_found': sorted(set(to_follow + to_unfollow) - set(authors)),
+    })
@@ -0,0 +1,349 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from yatube.settings import PAGE_CACHE_TIMEOUT, PUBLIC_CACHE_MAX_AGE
+
+GENERATION_KEY = 'generation:{}'
+PAGE_KEY = 'page:{}'
+
+GLOBAL_SCOPE = 'global'
+TIMELINES_SCOPE = 'timelines'
+PAGE_PARAMETERS = ('page', 'cursor')
+VALIDATORS_VERSION = '1'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def followers_scope(username):
+    return f'followers:{username}'
+
+
+def post_scope(pk):
+    return f'post:{pk}'
+
+
+def timeline_scope(user_id):
+    """Лента подписок пользователя (разложенные в неё посты)."""
+    return f'timeline:{user_id}'
+
+
+def author_card_scope(username):
+    """Имя автора в карточках постов: меняется только при сохранении User."""
+    return f'author-card:{username}'
+
+
+def group_card_scope(slug):
+    """Название группы в карточках: меняется только при сохранении Group."""
+    return f'group-card:{slug}'
+
+
+def generation_key(scope):
+    """Ключ поколения; имя области хешируется (в нём бывает юникод)."""
+    return GENERATION_KEY.format(hashlib.md5(scope.encode()).hexdigest())
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def get_generations(*scopes):
+    """Текущие поколения областей кеша одним обращением к кешу.
+
+    Отсутствующее поколение инициализируется текущим временем в мс,
+    чтобы после вытеснения ключа не совпасть со старыми значениями.
+    """
+    keys = {scope: generation_key(scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    generations = {}
+    for scope, key in keys.items():
+        if key not in found:
+            cache.add(key, now_ms(), None)
+            found[key] = cache.get(key)
+        generations[scope] = found[key]
+    return generations
+
+
+def bump_generations(*scopes):
+    """Инвалидация областей кеша: перевод поколений на текущее время.
+
+    Поколение - время последнего изменения области в мс (из него
+    строится Last-Modified ответов API), но растёт минимум на 1.
+    Сдвиг прибавляется через incr: на Memcached и Redis он атомарен,
+    и одновременные инвалидации из разных процессов не теряются.
+    У FileBasedCache incr - чтение и запись, поэтому при нескольких
+    процессах L2 должен быть Memcached или Redis.
+    Внутри транзакции поколения сдвигаются ещё раз после коммита:
+    страницы, которые другие процессы успели отрендерить по данным
+    до коммита, тоже перестают использоваться.
+    """
+    _shift_generations(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(_shift_generations, scopes))
+
+
+def _shift_generations(scopes):
+    keys = {generation_key(scope) for scope in scopes}
+    now = now_ms()
+    found = cache.get_many(keys)
+    for key in keys:
+        try:
+            cache.incr(key, max(now - found.get(key, now), 1))
+        except ValueError:
+            cache.add(key, now, None)
+
+
+def modified_at(generations):
+    """Время последнего изменения по поколениям, не позже текущего."""
+    if not generations:
+        return None
+    stamp = min(max(generations.values()), now_ms())
+    return datetime.fromtimestamp(stamp / 1000, tz=timezone.utc)
+
+
+def generation_stamp(*scopes):
+    """Строковая метка поколений для ключей кеша."""
+    generations = get_generations(*scopes)
+    return '-'.join(str(generations[scope]) for scope in scopes)
+
+
+def current_group_slug(post):
+    return post.group.slug if post.group_id else None
+
+
+def post_scopes(post, *group_slugs):
+    """Области кеша всех страниц, на которых виден пост."""
+    return [
+        GLOBAL_SCOPE,
+        post_scope(post.pk),
+        author_scope(post.author.username),
+        *(group_scope(slug) for slug in group_slugs if slug)
+    ]
+
+
+def queryset_scopes(posts):
+    """Области кеша страниц постов выборки (без GLOBAL_SCOPE)."""
+    scopes = set()
+    rows = posts.values_list('pk', 'author__username', 'group__slug')
+    for pk, username, slug in rows.distinct():
+        scopes.update((post_scope(pk), author_scope(username)))
+        if slug:
+            scopes.add(group_scope(slug))
+    return scopes
+
+
+def invalidate_post(post, *group_slugs):
+    """Инвалидация кеша всех страниц, на которых виден пост."""
+    bump_generations(*post_scopes(post, *group_slugs))
+
+
+def card_scopes(post):
+    """Области кеша карточки поста в ленте.
+
+    Не author_scope и group_scope: их сдвигает каждый новый пост
+    и комментарий автора или группы, и карточки всех соседних постов
+    рендерились бы заново.
+    """
+    scopes = [post_scope(post.pk), author_card_scope(post.author.username)]
+    if post.group_id:
+        scopes.append(group_card_scope(post.group.slug))
+    return scopes
+
+
+def attach_generations(posts):
+    """Метка поколения каждого поста ленты для фрагментного кеша.
+
+    Метка меняется при изменении самого поста (в том числе его
+    комментариев), а также при сохранении его группы или автора.
+    """
+    posts = list(posts)
+    scopes = set()
+    for post in posts:
+        scopes.update(card_scopes(post))
+    generations = get_generations(*scopes)
+    for post in posts:
+        post.generation = '-'.join(
+            str(generations[scope]) for scope in card_scopes(post)
+        )
+    return posts
+
+
+def parameters_key(request, parameters):
+    """Часть ключа кеша: значения параметров запроса, которые читает view.
+
+    Остальные параметры (метки рекламы, мусор) не размножают ключи.
+    """
+    return repr([
+        (name, request.GET.getlist(name)) for name in parameters
+        if name in request.GET
+    ])
+
+
+def cached_page(raw_key, render_view):
+    """Ответ из кеша страниц или рендер render_view() с сохранением.
+
+    Сохраняются только ответы 200 без cookie; после инвалидации
+    страницу через get_or_set рендерит один процесс. Срок хранения
+    PAGE_CACHE_TIMEOUT: в ключе бывают курсоры из запроса, и записи
+    старых поколений и курсоров не должны копиться бессрочно.
+    """
+    key = PAGE_KEY.format(hashlib.md5(raw_key.encode()).hexdigest())
+    rendered = []
+
+    def render():
+        response = render_view()
+        rendered.append(response)
+        if response.status_code == 200 and not response.cookies:
+            return response.content, response['Content-Type']
+        return None
+
+    cached = cache.get_or_set(key, render, PAGE_CACHE_TIMEOUT)
+    if rendered:
+        return rendered[0]
+    content, content_type = cached
+    return HttpResponse(content, content_type=content_type)
+
+
+def generation_cache_page(*scope_templates, parameters=PAGE_PARAMETERS):
+    """Кеширование страницы до смены поколения её областей.
+
+    Шаблоны областей форматируются именованными аргументами view.
+    Ответ кешируется для каждого пользователя отдельно и перестаёт
+    использоваться, как только меняется содержимое; в ключ входят
+    только параметры запроса parameters, которые читает view.
+    Шаблоны областей и параметры сохраняются в cache_scopes
+    и cache_parameters представления - по ним
+    AnonymousPageCacheMiddleware строит свои ключи.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = [
+                template.format(**kwargs) for template in scope_templates
+            ]
+            raw_key = ':'.join((
+                view.__name__,
+                generation_stamp(*scopes),
+                str(request.user.pk or 0),
+                request.path,
+                parameters_key(request, parameters),
+            ))
+            return cached_page(
+                raw_key, lambda: view(request, *args, **kwargs)
+            )
+        wrapper.cache_scopes = scope_templates
+        wrapper.cache_parameters = parameters
+        return wrapper
+    return decorator
+
+
+def request_generations(request, scopes, kwargs):
+    """Поколения областей scopes(request, **kwargs), одни на весь запрос."""
+    if not hasattr(request, 'content_generations'):
+        request.content_generations = get_generations(
+            *scopes(request, **kwargs)
+        )
+    return request.content_generations
+
+
+def shared_cache_page(scopes, parameters=PAGE_PARAMETERS):
+    """Кеширование страницы, общей для всех пользователей.
+
+    Страница хранится до смены поколения областей
+    scopes(request, **kwargs) - как у versioned, поколения
+    читаются один раз на запрос; из параметров запроса в ключ
+    входят только parameters. Персональные части в кеш
+    не попадают: представление обёрнуто в core.holes.punch_holes,
+    и они заполняются при каждом ответе.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            generations = request_generations(request, scopes, kwargs)
+            raw_key = ':'.join((
+                view.__name__,
+                ','.join(
+                    f'{scope}={generation}' for scope, generation
+                    in sorted(generations.items())
+                ),
+                request.path,
+                parameters_key(request, parameters),
+            ))
+            return cached_page(
+                raw_key, lambda: view(request, *args, **kwargs)
+            )
+        return wrapper
+    return decorator
+
+
+def versioned(scopes):
+    """Сильный ETag, Last-Modified и Cache-Control из поколений кеша.
+
+    scopes(request, **kwargs) возвращает области, от которых зависит
+    ответ. Поколения читаются один раз на запрос; при совпадении
+    If-None-Match или If-Modified-Since ответ - 304 без рендера.
+    ETag страницы авторизованного пользователя зависит от него
+    и от CSRF-cookie: в его страницах есть имя и CSRF-токен.
+    Анонимные ответы публичные (их может кешировать обратный
+    прокси, Vary: Cookie отделяет их от авторизованных), ответы
+    авторизованным - приватные и всегда перепроверяются.
+    """
+    def generations(request, **kwargs):
+        return request_generations(request, scopes, kwargs)
+
+    def etag(request, **kwargs):
+        stamp = ','.join(
+            f'{scope}={generation}' for scope, generation
+            in sorted(generations(request, **kwargs).items())
+        )
+        viewer = ''
+        if request.user.is_authenticated:
+            csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+            viewer = f'{request.user.pk}:{csrf_cookie}'
+        raw = '|'.join((
+            VALIDATORS_VERSION, request.get_full_path(), viewer, stamp
+        ))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, **kwargs):
+        return modified_at(generations(request, **kwargs))
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method not in ('GET', 'HEAD'):
+                return response
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response, public=True, max_age=PUBLIC_CACHE_MAX_AGE,
+                    must_revalidate=True,
+                )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
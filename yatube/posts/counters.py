@@ -0,0 +1,160 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from core.background import BackgroundQueue
+from yatube.settings import COUNT_REFRESH_INTERVAL
+
+from .cache import (GLOBAL_SCOPE, TIMELINES_SCOPE, author_scope,
+                    bump_generations, followers_scope, group_scope,
+                    queryset_scopes)
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+COUNT_KEY = 'count:{}'
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарное изменение счётчика через F(), без гонок чтения-записи."""
+    return model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, Value(0))}
+    )
+
+
+def change_user_counter(user_id, field, delta):
+    """Изменение счётчика пользователя, строка создаётся при отсутствии."""
+    if not change_counter(UserCounters, user_id, field, delta):
+        UserCounters.objects.get_or_create(
+            user_id=user_id, defaults=user_counter_values(user_id)
+        )
+
+
+def user_counter_values(user_id):
+    """Точные значения счётчиков одного пользователя."""
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def get_user_counters(user):
+    """Счётчики пользователя (создаются при первом обращении)."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        counters, _ = UserCounters.objects.get_or_create(
+            user=user, defaults=user_counter_values(user.pk)
+        )
+        return counters
+
+
+def _count(model, field):
+    """Коррелированный подзапрос числа строк model на внешний pk."""
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+COUNTERS = (
+    (Group, 'posts_count', Post, 'group'),
+    (Post, 'comments_count', Comment, 'post'),
+    (UserCounters, 'posts_count', Post, 'author'),
+    (UserCounters, 'followers_count', Follow, 'author'),
+    (UserCounters, 'following_count', Follow, 'user'),
+)
+
+
+def find_counter_mismatches():
+    """Список (модель, pk, поле, сохранено, фактически) расхождений."""
+    missing = User.objects.filter(counters__isnull=True)
+    mismatches = [
+        (UserCounters, pk, 'user', None, 'missing')
+        for pk in missing.values_list('pk', flat=True)
+    ]
+    for model, field, source, relation in COUNTERS:
+        rows = (
+            model.objects.annotate(actual=_count(source, relation))
+            .exclude(**{field: F('actual')})
+            .values_list('pk', field, 'actual')
+        )
+        mismatches.extend(
+            (model, pk, field, stored, actual)
+            for pk, stored, actual in rows.iterator()
+        )
+    return mismatches
+
+
+def recount_counters():
+    """Пересчёт всех счётчиков: по одному UPDATE на каждый счётчик."""
+    users = User.objects.filter(counters__isnull=True)
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=pk)
+         for pk in users.values_list('pk', flat=True).iterator()),
+        batch_size=500,
+    )
+    for model, field, source, relation in COUNTERS:
+        model.objects.update(**{field: _count(source, relation)})
+
+
+def invalidate_mismatches(mismatches):
+    """Сброс кеша страниц со счётчиками из find_counter_mismatches.
+
+    recount_counters пишет через update() без сигналов, поэтому
+    поколения затронутых групп, постов, авторов и лент подписок
+    сдвигаются здесь.
+    """
+    pks = {Group: set(), Post: set(), UserCounters: set()}
+    for model, pk, *_ in mismatches:
+        pks[model].add(pk)
+    if not any(pks.values()):
+        return
+    scopes = {GLOBAL_SCOPE, TIMELINES_SCOPE}
+    scopes.update(
+        group_scope(slug) for slug in Group.objects.filter(
+            pk__in=pks[Group]
+        ).values_list('slug', flat=True)
+    )
+    scopes.update(queryset_scopes(Post.objects.filter(pk__in=pks[Post])))
+    for username in User.objects.filter(
+        pk__in=pks[UserCounters]
+    ).values_list('username', flat=True):
+        scopes.update((author_scope(username), followers_scope(username)))
+    bump_generations(*scopes)
+
+
+def counted(queryset):
+    """Точное число строк выборки и время подсчёта."""
+    return queryset.count(), time.time()
+
+
+def refresh_count(name, queryset):
+    """Задача фоновой очереди: пересчёт числа строк в кеше."""
+    cache.set(COUNT_KEY.format(name), counted(queryset), None)
+
+
+count_refresher = BackgroundQueue('count-refresher', refresh_count)
+
+
+def cached_count(name, queryset):
+    """Оценка числа строк выборки по кешу без COUNT(*) в запросе.
+
+    Подсчёт в запросе - только при пустом кеше (один процесс,
+    остальные ждут результат); значение старше
+    COUNT_REFRESH_INTERVAL секунд отдаётся, пока пересчитывается в фоне.
+    """
+    cached = cache.get(COUNT_KEY.format(name))
+    if cached is None:
+        cached = cache.get_or_set(
+            COUNT_KEY.format(name), lambda: counted(queryset), None
+        )
+    value, counted_at = cached
+    if time.time() - counted_at > COUNT_REFRESH_INTERVAL:
+        count_refresher.submit(name, queryset)
+    return value
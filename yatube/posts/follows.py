@@ -0,0 +1,59 @@
+from functools import partial
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import Follow
+
+FOLLOWING_KEY = 'following:{}'
+
+
+def following_ids(user_id):
+    """Множество id авторов, на которых подписан пользователь.
+
+    Хранится в кеше до изменения подписок пользователя (ключ
+    сбрасывается в сигналах Follow и не кешируется в L1).
+    """
+    return cache.get_or_set(
+        FOLLOWING_KEY.format(user_id),
+        lambda: frozenset(
+            Follow.objects.filter(user_id=user_id).values_list(
+                'author_id', flat=True
+            )
+        ),
+        None,
+    )
+
+
+def forget_following(user_id):
+    """Сброс кеша подписок пользователя.
+
+    Внутри транзакции ключ удаляется ещё раз после коммита: иначе
+    другой запрос успел бы закешировать подписки до коммита.
+    """
+    key = FOLLOWING_KEY.format(user_id)
+    cache.delete(key)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(cache.delete, key))
+
+
+def follow(user, author):
+    """Идемпотентная подписка одним INSERT; True, если она новая.
+
+    Повтор упирается в уникальное ограничение, а не в
+    предварительную проверку, поэтому безопасен и при гонках.
+    """
+    if user == author:
+        return False
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user, author):
+    """Идемпотентная отписка; True, если подписка была."""
+    deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+    return bool(deleted)
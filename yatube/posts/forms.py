@@ -1,6 +1,7 @@
 from django import forms
 
 from .models import Comment, Post
+from .uploads import normalize_image
 
 
 class PostForm(forms.ModelForm):
@@ -14,6 +15,19 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError('Поле не заполнено')
         return data
 
+    def clean_image(self):
+        return normalize_image(self.cleaned_data['image'])
+
+    def clean(self):
+        """Причина отказа вместо «неверного изображения» для отклонённых."""
+        cleaned_data = super().clean()
+        upload = self.files.get(self.add_prefix('image'))
+        reason = getattr(upload, 'rejected_reason', None)
+        if reason:
+            self.errors['image'] = self.error_class([reason])
+            cleaned_data.pop('image', None)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
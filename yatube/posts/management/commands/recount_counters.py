@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.counters import (find_counter_mismatches, invalidate_mismatches,
+                            recount_counters)
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт и проверка денормализованных счётчиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счётчики, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = find_counter_mismatches()
+        for model, pk, field, stored, actual in mismatches:
+            self.stdout.write(
+                f'{model.__name__}(pk={pk}).{field}: '
+                f'сохранено {stored}, фактически {actual}'
+            )
+        if options['check']:
+            if mismatches:
+                raise CommandError(
+                    f'Расхождений в счётчиках: {len(mismatches)}'
+                )
+            self.stdout.write(self.style.SUCCESS('Счётчики корректны'))
+            return
+        recount_counters()
+        invalidate_mismatches(mismatches)
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны, исправлено расхождений: {len(mismatches)}'
+        ))
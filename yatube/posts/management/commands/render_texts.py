@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Post
+from posts.rendering import render_texts
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт сохранённого HTML текста постов и комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Число строк, обновляемых одним запросом',
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Только строки без HTML (например, после bulk_create)',
+        )
+
+    def handle(self, *args, **options):
+        for model in (Post, Comment):
+            updated = render_texts(
+                model, model.rendered_fields,
+                options['batch_size'], options['missing'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'{model.__name__}: обновлено строк {updated}'
+            ))
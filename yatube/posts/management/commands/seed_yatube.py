@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.seed import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерация синтетических пользователей, групп, постов, '
+        'комментариев и подписок для нагрузочного тестирования'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument('--follows', type=int, default=100000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора: одинаковое зерно - одинаковые данные',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Число строк в одном INSERT',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой (от 0 до 1)',
+        )
+        parser.add_argument(
+            '--follow-alpha', type=float, default=1.0,
+            help='Показатель степенного распределения подписчиков',
+        )
+        parser.add_argument(
+            '--no-index', action='store_true',
+            help='Не строить поисковый индекс',
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images должно быть от 0 до 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должно быть больше 0')
+        start = time.perf_counter()
+        with transaction.atomic():
+            created = Seeder(options['seed'], options['batch_size']).run(
+                options['users'], options['groups'], options['posts'],
+                options['comments'], options['follows'],
+                index=not options['no_index'],
+                images=options['images'],
+                follow_alpha=options['follow_alpha'],
+            )
+        for model, count in created.items():
+            self.stdout.write(f'{model}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы за {time.perf_counter() - start:.1f} с'
+        ))
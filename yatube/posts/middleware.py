@@ -0,0 +1,106 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from yatube.settings import ANONYMOUS_CACHE_TIMEOUT
+
+from .cache import PAGE_PARAMETERS, generation_stamp, parameters_key
+
+ANONYMOUS_PAGE_KEY = 'anonymous:{}'
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control',
+                  'Vary')
+
+
+class AnonymousPageCacheMiddleware:
+    """Готовые страницы лент для анонимных пользователей.
+
+    Стоит после SecurityMiddleware и XFrameOptionsMiddleware (их
+    заголовки получают и ответы из кеша) и перед SessionMiddleware:
+    для запроса без cookie сессии страница представления с областями
+    кеша (generation_cache_page) отдаётся из кеша без сессии,
+    аутентификации, рендера и БД.
+    Ключ - представление, путь, читаемые им параметры запроса
+    (cache_parameters) и поколения областей, поэтому изменение
+    содержимого сразу даёт новый ключ;
+    ANONYMOUS_CACHE_TIMEOUT лишь ограничивает время жизни записей.
+    При промахе страницу рендерит один процесс (get_or_set),
+    остальные ждут его результат.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = self.cache_key(request)
+        if key is None:
+            return self.get_response(request)
+        rendered = []
+
+        def render():
+            response = self.get_response(request)
+            rendered.append(response)
+            if self.is_cacheable(request, response):
+                return response.content, [
+                    (header, response[header]) for header in CACHED_HEADERS
+                    if response.has_header(header)
+                ]
+            return None
+
+        cached = cache.get_or_set(key, render, ANONYMOUS_CACHE_TIMEOUT)
+        if rendered:
+            return rendered[0]
+        content, headers = cached
+        response = HttpResponse(content)
+        for header, value in headers:
+            response[header] = value
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response,
+        )
+
+    def cache_key(self, request):
+        """Ключ страницы или None, если запрос не кешируется."""
+        if (not ANONYMOUS_CACHE_TIMEOUT
+                or request.method not in ('GET', 'HEAD')
+                or settings.SESSION_COOKIE_NAME in request.COOKIES):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        scopes = getattr(match.func, 'cache_scopes', None)
+        if scopes is None:
+            return None
+        request.resolver_match = match
+        parameters = parameters_key(request, getattr(
+            match.func, 'cache_parameters', PAGE_PARAMETERS
+        ))
+        raw_key = '|'.join((
+            match.view_name,
+            generation_stamp(*(
+                scope.format(**match.kwargs) for scope in scopes
+            )),
+            request.path,
+            parameters,
+        ))
+        return ANONYMOUS_PAGE_KEY.format(
+            hashlib.md5(raw_key.encode()).hexdigest()
+        )
+
+    def is_cacheable(self, request, response):
+        user = getattr(request, 'user', None)
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and (user is None or not user.is_authenticated)
+        )
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:49
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+
+# Копия posts.rendering на момент миграции: код приложения может
+# измениться, а миграция должна давать тот же результат.
+EXCERPT_LENGTH = 300
+
+
+def render_html(text):
+    return linebreaks(text, autoescape=True)
+
+
+def fill_rendered_text(apps, schema_editor):
+    for name, renderers in (
+        ('Post', {
+            'text_html': render_html,
+            'excerpt_html': lambda text: render_html(
+                Truncator(text).chars(EXCERPT_LENGTH)
+            ),
+        }),
+        ('Comment', {'text_html': render_html}),
+    ):
+        model = apps.get_model('posts', name)
+        queryset = model.objects.order_by('pk').only('pk', 'text')
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:500])
+            if not batch:
+                break
+            for obj in batch:
+                for field, render in renderers.items():
+                    setattr(obj, field, render(obj.text))
+            model.objects.bulk_update(batch, list(renderers))
+            last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(default='', editable=False, verbose_name='HTML текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_html',
+            field=models.TextField(default='', editable=False, verbose_name='HTML отрывка'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(default='', editable=False, verbose_name='HTML текста'),
+        ),
+        migrations.RunPython(fill_rendered_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:51
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+# Копия posts.rendering.is_truncated на момент миграции.
+EXCERPT_LENGTH = 300
+
+
+def fill_truncated(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    queryset = Post.objects.order_by('pk').only('pk', 'text')
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:500])
+        if not batch:
+            break
+        for post in batch:
+            post.truncated = (
+                Truncator(post.text).chars(EXCERPT_LENGTH) != post.text
+            )
+        Post.objects.bulk_update(batch, ['truncated'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_rendered_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='truncated',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Текст длиннее отрывка'),
+        ),
+        migrations.RunPython(fill_truncated, migrations.RunPython.noop),
+    ]
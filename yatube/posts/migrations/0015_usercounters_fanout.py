@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_popular_authors(apps, schema_editor):
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    UserCounters.objects.filter(
+        followers_count__gt=settings.FANOUT_FOLLOWERS_LIMIT
+    ).update(fanout=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_truncated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounters',
+            name='fanout',
+            field=models.BooleanField(default=True, verbose_name='Посты раскладываются по лентам'),
+        ),
+        migrations.RunPython(mark_popular_authors, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,75 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .cache import queryset_scopes
+from .rendering import rendered
+
 User = get_user_model()
 
+FEED_FIELDS = (
+    'excerpt_html',
+    'truncated',
+    'pub_date',
+    'image',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'comments_count',
+    'group__title',
+    'group__slug',
+)
+
+
+class CountersMixin:
+    """Сохранение существующей записи без перезаписи счётчиков.
+
+    Счётчики меняются только через F()-выражения в сигналах, поэтому
+    загруженное ранее значение не должно затирать актуальное.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class RenderedTextMixin:
+    """HTML текста, отрисованный при сохранении, а не при каждом показе.
+
+    Поля rendered_fields пересчитываются из text при любом save()
+    (формы, админка, код); шаблоны выводят их как есть.
+    text_scopes(pks) - области кеша страниц с текстами строк pks.
+    """
+    rendered_fields = ()
+
+    def save(self, *args, **kwargs):
+        for field, value in rendered(self.text, self.rendered_fields).items():
+            setattr(self, field, value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = [
+                *update_fields, *self.rendered_fields
+            ]
+        super().save(*args, **kwargs)
+
 
-class Group(models.Model):
+class Group(CountersMixin, models.Model):
     """Модель БД для сообществ."""
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=50, unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число постов',
+    )
+
+    counter_fields = ('posts_count',)
 
     class Meta:
         ordering = ['pk']
@@ -17,12 +78,39 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Выборка постов для лент без N+1 запросов в шаблонах.
+
+        Автор и группа подтягиваются JOIN-ом, загружаются только
+        отображаемые в ленте колонки (включая счётчик комментариев):
+        вместо полного текста - его отрывок, текст целиком читается
+        только на странице поста.
+        """
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+
+class Post(RenderedTextMixin, CountersMixin, models.Model):
     """Модель БД для постов."""
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Текст нового поста',
     )
+    text_html = models.TextField(
+        default='',
+        editable=False,
+        verbose_name='HTML текста',
+    )
+    excerpt_html = models.TextField(
+        default='',
+        editable=False,
+        verbose_name='HTML отрывка',
+    )
+    truncated = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Текст длиннее отрывка',
+    )
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата публикации',
@@ -48,15 +136,39 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    counter_fields = ('comments_count',)
+    rendered_fields = ('text_html', 'excerpt_html', 'truncated')
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    @classmethod
+    def text_scopes(cls, pks):
+        return queryset_scopes(cls.objects.filter(pk__in=pks))
 
-class Comment(models.Model):
+
+class Comment(RenderedTextMixin, models.Model):
     """Модель БД для комментариев."""
     post = models.ForeignKey(
         Post,
@@ -74,13 +186,30 @@ class Comment(models.Model):
         verbose_name='Текст комментария',
         help_text='Текст нового комментария',
     )
+    text_html = models.TextField(
+        default='',
+        editable=False,
+        verbose_name='HTML текста',
+    )
     created = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата комментария',
     )
 
+    rendered_fields = ('text_html',)
+
+    @classmethod
+    def text_scopes(cls, pks):
+        return queryset_scopes(Post.objects.filter(comments__pk__in=pks))
+
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -108,3 +237,98 @@ class Follow(models.Model):
                 name='unique_subscribe'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='follow_user_author_idx'
+            ),
+        ]
+
+
+class UserCounters(models.Model):
+    """Модель БД для денормализованных счётчиков пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок',
+    )
+    fanout = models.BooleanField(
+        default=True,
+        verbose_name='Посты раскладываются по лентам',
+    )
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """Модель БД для материализованной ленты подписок (fan-out on write)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель ленты',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации поста',
+    )
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_date_post_idx'
+            )
+        ]
+
+
+class SearchTerm(models.Model):
+    """Модель БД для обратного поискового индекса (без FTS5)."""
+    term = models.CharField(
+        max_length=64,
+        verbose_name='Основа слова',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Пост',
+    )
+    weight = models.FloatField(
+        verbose_name='Вес основы в посте',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'],
+                name='unique_search_term'
+            )
+        ]
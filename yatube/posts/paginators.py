@@ -0,0 +1,227 @@
+import base64
+import binascii
+
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from yatube.settings import EXACT_COUNT_BELOW, PAGE_LINKS
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+DEFAULT_KEYSET = ('-pub_date', '-pk')
+
+
+def cursor_key(post):
+    """Ключ (cursor_date, cursor_pk) поста или строки values()."""
+    if isinstance(post, dict):
+        return post['cursor_date'], post['cursor_pk']
+    return post.cursor_date, post.cursor_pk
+
+
+def encode_token(*parts):
+    """Непрозрачный токен: части через '|' в base64 без выравнивания."""
+    raw = '|'.join(str(part) for part in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token, count):
+    """Строки-части токена; None для пустого, битого или не из count частей."""
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        parts = base64.urlsafe_b64decode(token + padding).decode().split('|')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return parts if len(parts) == count else None
+
+
+def encode_cursor(direction, post):
+    """Непрозрачный токен курсора из ключа (cursor_date, cursor_pk) поста."""
+    pub_date, pk = cursor_key(post)
+    return encode_token(direction, pub_date.isoformat(), pk)
+
+
+def decode_cursor(token):
+    """Разбор токена курсора, None для пустого или битого токена."""
+    parts = decode_token(token, 3)
+    if parts is None:
+        return None
+    direction, pub_date, pk = parts
+    try:
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except ValueError:
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPage:
+    """Страница курсорного паджинатора.
+
+    is_first - первая ли это страница (по умолчанию - если нет
+    курсора назад); паджинатор без перехода назад передаёт его явно,
+    чтобы со второй страницы была ссылка на первую.
+    """
+    cursor_mode = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor,
+                 is_first=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        if is_first is None:
+            is_first = previous_cursor is None
+        self.is_first = is_first
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or not self.is_first
+
+
+class EstimatedPaginator(Paginator):
+    """Паджинатор Django с оценкой числа объектов вместо COUNT(*).
+
+    estimate - число или функция без аргументов, вызываемая только
+    при обращении к count. Оценки меньше EXACT_COUNT_BELOW
+    заменяются точным подсчётом: в небольших лентах неточность
+    заметна, а COUNT(*) дёшев. Страницы за пределами завышенной
+    оценки просто пусты.
+    """
+
+    def __init__(self, object_list, per_page, estimate, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.estimate = estimate
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate
+        if callable(estimate):
+            estimate = estimate()
+        if estimate < EXACT_COUNT_BELOW:
+            return super().count
+        return estimate
+
+
+def elided_page_range(number, num_pages, limit=PAGE_LINKS):
+    """Номера страниц для навигации, None - пропуск «…».
+
+    Первая и последняя страницы и окно вокруг текущей; элементов
+    не больше limit (но не меньше пяти) при любом числе страниц.
+    """
+    limit = max(limit, 5)
+    if num_pages <= limit:
+        return list(range(1, num_pages + 1))
+    side = (limit - 5) // 2
+    start = max(number - side, 1)
+    end = min(number + side, num_pages)
+    links = []
+    if start > 1:
+        links.append(1)
+    if start > 2:
+        links.append(None if start > 3 else 2)
+    links.extend(range(start, end + 1))
+    if end < num_pages - 1:
+        links.append(None if end < num_pages - 2 else num_pages - 1)
+    if end < num_pages:
+        links.append(num_pages)
+    return links
+
+
+def page_links(page_obj, limit=PAGE_LINKS):
+    """Навигация для страницы обычного паджинатора Django."""
+    return elided_page_range(
+        page_obj.number, page_obj.paginator.num_pages, limit
+    )
+
+
+def keyset_fields(queryset):
+    """Поля ключа из явной сортировки выборки (имена или F().desc())."""
+    fields = [
+        getattr(getattr(item, 'expression', None), 'name', item)
+        for item in queryset.query.order_by
+    ] or DEFAULT_KEYSET
+    return [name.lstrip('-') for name in fields]
+
+
+class CursorPaginator:
+    """Keyset-паджинатор по (pub_date, id) без COUNT и OFFSET.
+
+    Стоимость любой страницы одинакова: выборка идёт по индексу
+    от позиции курсора, а не со смещением от начала ленты.
+    Явная сортировка выборки по паре полей (дата, id) заменяет
+    ключ по умолчанию - так лента подписок идёт по индексу
+    TimelineEntry. Ключ добавляется к выборке аннотациями
+    (в том числе к выборке values()).
+    """
+
+    def __init__(self, object_list, per_page):
+        date_field, pk_field = keyset_fields(object_list)
+        self.object_list = object_list.annotate(
+            cursor_date=F(date_field), cursor_pk=F(pk_field)
+        ).order_by('-cursor_date', '-cursor_pk')
+        self.per_page = int(per_page)
+
+    def get_page(self, cursor):
+        """Страница после/до курсора; первая - для пустого курсора."""
+        position = decode_cursor(cursor)
+        if position is None:
+            return self._forward(self.object_list, first=True)
+        direction, pub_date, pk = position
+        if direction == CURSOR_NEXT:
+            queryset = self.object_list.filter(
+                Q(cursor_date__lt=pub_date)
+                | Q(cursor_date=pub_date, cursor_pk__lt=pk)
+            )
+            return self._forward(queryset, first=False)
+        queryset = self.object_list.filter(
+            Q(cursor_date__gt=pub_date)
+            | Q(cursor_date=pub_date, cursor_pk__gt=pk)
+        ).reverse()
+        return self._backward(queryset)
+
+    def _forward(self, queryset, first):
+        posts = list(queryset[:self.per_page + 1])
+        has_next = len(posts) > self.per_page
+        posts = posts[:self.per_page]
+        next_cursor = None
+        previous_cursor = None
+        if has_next:
+            next_cursor = encode_cursor(CURSOR_NEXT, posts[-1])
+        if posts and not first:
+            previous_cursor = encode_cursor(CURSOR_PREVIOUS, posts[0])
+        return CursorPage(posts, self, next_cursor, previous_cursor)
+
+    def _backward(self, queryset):
+        posts = list(queryset[:self.per_page + 1])
+        has_previous = len(posts) > self.per_page
+        posts = posts[:self.per_page][::-1]
+        next_cursor = None
+        previous_cursor = None
+        if posts:
+            next_cursor = encode_cursor(CURSOR_NEXT, posts[-1])
+        if has_previous:
+            previous_cursor = encode_cursor(CURSOR_PREVIOUS, posts[0])
+        return CursorPage(posts, self, next_cursor, previous_cursor)
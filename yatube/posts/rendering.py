@@ -0,0 +1,66 @@
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+from yatube.settings import POST_EXCERPT_LENGTH
+
+from .cache import GLOBAL_SCOPE, bump_generations
+
+
+def render_html(text):
+    """HTML текста: экранирование и абзацы, как у фильтра linebreaks."""
+    return linebreaks(text, autoescape=True)
+
+
+def excerpt(text):
+    return Truncator(text).chars(POST_EXCERPT_LENGTH)
+
+
+def render_excerpt(text):
+    """HTML начала текста не длиннее POST_EXCERPT_LENGTH символов."""
+    return render_html(excerpt(text))
+
+
+def is_truncated(text):
+    """Длиннее ли текст своего отрывка."""
+    return excerpt(text) != text
+
+
+RENDERERS = {
+    'text_html': render_html,
+    'excerpt_html': render_excerpt,
+    'truncated': is_truncated,
+}
+
+
+def rendered(text, fields):
+    """Значения полей fields, отрисованные из text."""
+    return {field: RENDERERS[field](text) for field in fields}
+
+
+def render_texts(model, fields, batch_size=500, missing_only=False):
+    """Пересчёт полей fields из text у строк model пачками по pk.
+
+    Каждая пачка - одна выборка (pk, text) и один bulk_update,
+    без сигналов сохранения, поэтому кеш страниц с текстами пачки
+    (model.text_scopes) сбрасывается здесь же, а GLOBAL_SCOPE - в конце.
+    missing_only - только строки с пустым text_html. Возвращает число
+    обновлённых строк.
+    """
+    queryset = model.objects.order_by('pk').only('pk', 'text')
+    if missing_only:
+        queryset = queryset.filter(text_html='')
+    updated = 0
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            if updated:
+                bump_generations(GLOBAL_SCOPE)
+            return updated
+        for obj in batch:
+            for field, value in rendered(obj.text, fields).items():
+                setattr(obj, field, value)
+        model.objects.bulk_update(batch, fields)
+        bump_generations(*model.text_scopes([obj.pk for obj in batch]))
+        updated += len(batch)
+        last_pk = batch[-1].pk
@@ -0,0 +1,342 @@
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Max, Q, Sum, When
+
+from yatube.settings import SEARCH_USE_FTS5
+
+from .models import Comment, Post, SearchTerm
+from .paginators import CursorPage, decode_token, encode_token
+from .stemmer import stem
+
+FTS_TABLE = 'posts_search'
+WORD_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+TEXT_WEIGHT = 2.0
+COMMENTS_WEIGHT = 1.0
+
+
+def tokenize(text):
+    """Основы слов текста в порядке появления."""
+    return [
+        stem(word) for word in WORD_RE.findall(text.lower())
+        if len(word) <= MAX_TERM_LENGTH
+    ]
+
+
+def query_terms(query):
+    """Различные основы слов запроса (не больше MAX_QUERY_TERMS)."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+class FTS5Index:
+    """Индекс в виртуальной таблице SQLite FTS5, ранжирование bm25.
+
+    В таблицу пишутся уже выделенные основы слов, поэтому FTS5
+    не нужен собственный стеммер для русского языка.
+    """
+
+    def update(self, post_id, text, comments):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, comments) '
+                f'VALUES (%s, %s, %s)',
+                [post_id, ' '.join(tokenize(text)),
+                 ' '.join(tokenize(comments))]
+            )
+
+    def add_many(self, rows):
+        """Запись пачки (post_id, text, comments) в очищенный индекс."""
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, comments) '
+                f'VALUES (%s, %s, %s)',
+                [
+                    (post_id, ' '.join(tokenize(text)),
+                     ' '.join(tokenize(comments)))
+                    for post_id, text, comments in rows
+                ],
+            )
+
+    def add_comment(self, post_id, text):
+        """Дописывание основ комментария в колонку comments."""
+        terms = ' '.join(tokenize(text))
+        if not terms:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {FTS_TABLE} SET comments = comments || ' ' || %s "
+                f'WHERE rowid = %s',
+                [terms, post_id]
+            )
+
+    def remove_comment(self, post_id, text):
+        """Удаление по одному вхождению каждой основы комментария."""
+        removed = Counter(tokenize(text))
+        if not removed:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT comments FROM {FTS_TABLE} WHERE rowid = %s',
+                [post_id]
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return
+            kept = []
+            for term in row[0].split():
+                if removed[term]:
+                    removed[term] -= 1
+                else:
+                    kept.append(term)
+            cursor.execute(
+                f'UPDATE {FTS_TABLE} SET comments = %s WHERE rowid = %s',
+                [' '.join(kept), post_id]
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, terms, after, limit):
+        match = ' '.join(f'"{term}"' for term in terms)
+        params = [TEXT_WEIGHT, COMMENTS_WEIGHT, match]
+        sql = (
+            f'SELECT score, rowid FROM ('
+            f'SELECT rowid, -bm25({FTS_TABLE}, %s, %s) AS score '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+        )
+        if after:
+            sql += ' WHERE score < %s OR (score = %s AND rowid > %s)'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY score DESC, rowid LIMIT %s'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return cursor.fetchall()
+
+
+class TermIndex:
+    """Обратный индекс в таблице SearchTerm, ранжирование tf-idf.
+
+    Запасной вариант для СУБД без FTS5; строки основ обновляются
+    из сигналов при сохранении постов и комментариев.
+    """
+
+    def terms(self, post_id, text, comments):
+        weights = Counter()
+        for term in tokenize(text):
+            weights[term] += TEXT_WEIGHT
+        for term in tokenize(comments):
+            weights[term] += COMMENTS_WEIGHT
+        return (
+            SearchTerm(post_id=post_id, term=term, weight=weight)
+            for term, weight in weights.items()
+        )
+
+    def update(self, post_id, text, comments):
+        SearchTerm.objects.filter(post_id=post_id).delete()
+        SearchTerm.objects.bulk_create(
+            self.terms(post_id, text, comments), batch_size=500
+        )
+
+    def add_many(self, rows):
+        """Запись пачки (post_id, text, comments) в очищенный индекс."""
+        SearchTerm.objects.bulk_create(
+            (term for row in rows for term in self.terms(*row)),
+            batch_size=500,
+        )
+
+    def change_comment_weights(self, post_id, text, sign):
+        """Сдвиг весов основ комментария: sign 1 - добавить, -1 - убрать.
+
+        Основы с одинаковым числом вхождений обновляются одним запросом.
+        """
+        counts = Counter(tokenize(text))
+        if not counts:
+            return
+        terms = SearchTerm.objects.filter(post_id=post_id)
+        existing = set(
+            terms.filter(term__in=counts).values_list('term', flat=True)
+        )
+        groups = {}
+        for term in existing:
+            groups.setdefault(counts[term], []).append(term)
+        for count, group in groups.items():
+            terms.filter(term__in=group).update(
+                weight=F('weight') + sign * count * COMMENTS_WEIGHT
+            )
+        if sign > 0:
+            SearchTerm.objects.bulk_create(
+                SearchTerm(
+                    post_id=post_id, term=term,
+                    weight=count * COMMENTS_WEIGHT,
+                )
+                for term, count in counts.items() if term not in existing
+            )
+        else:
+            terms.filter(term__in=existing, weight__lte=0).delete()
+
+    def add_comment(self, post_id, text):
+        self.change_comment_weights(post_id, text, 1)
+
+    def remove_comment(self, post_id, text):
+        self.change_comment_weights(post_id, text, -1)
+
+    def remove(self, post_id):
+        SearchTerm.objects.filter(post_id=post_id).delete()
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+
+    def search(self, terms, after, limit):
+        matches = SearchTerm.objects.filter(term__in=terms).order_by()
+        frequencies = dict(
+            matches.values_list('term').annotate(Count('pk'))
+        )
+        if len(frequencies) < len(terms):
+            return []
+        total = Post.objects.aggregate(Max('pk'))['pk__max'] or 1
+        score = Sum(Case(
+            *(
+                When(
+                    term=term,
+                    then=F('weight') * math.log(1 + total / frequency),
+                )
+                for term, frequency in frequencies.items()
+            ),
+            output_field=FloatField(),
+        ))
+        rows = matches.values('post_id').annotate(
+            matched=Count('pk'), score=score
+        ).filter(matched=len(terms))
+        if after:
+            rows = rows.filter(
+                Q(score__lt=after[0]) | Q(score=after[0], post_id__gt=after[1])
+            )
+        rows = rows.order_by('-score', 'post_id')[:limit]
+        return [(row['score'], row['post_id']) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def fts5_table_exists():
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def get_index():
+    """FTS5, если таблица создана миграцией, иначе SearchTerm."""
+    if (SEARCH_USE_FTS5 and connection.vendor == 'sqlite'
+            and fts5_table_exists()):
+        return FTS5Index()
+    return TermIndex()
+
+
+def comments_text(post_id):
+    return '\n'.join(
+        Comment.objects.filter(post_id=post_id).values_list('text', flat=True)
+    )
+
+
+def index_post(post_id):
+    """Переиндексация поста вместе с его комментариями."""
+    text = Post.objects.filter(pk=post_id).values_list('text', flat=True)
+    text = text.first()
+    if text is None:
+        return
+    get_index().update(post_id, text, comments_text(post_id))
+
+
+def remove_post(post_id):
+    get_index().remove(post_id)
+
+
+def index_comment(post_id, text):
+    """Добавление основ нового комментария без переиндексации поста."""
+    get_index().add_comment(post_id, text)
+
+
+def unindex_comment(post_id, text):
+    get_index().remove_comment(post_id, text)
+
+
+def rebuild_index(batch_size=500):
+    """Полная переиндексация; комментарии читаются пачками постов."""
+    index = get_index()
+    index.clear()
+    posts = Post.objects.order_by('pk').values_list('pk', 'text')
+    indexed = 0
+    batch = []
+    for row in posts.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) == batch_size:
+            indexed += _index_batch(index, batch)
+            batch = []
+    return indexed + _index_batch(index, batch)
+
+
+def _index_batch(index, batch):
+    comments = {}
+    rows = Comment.objects.filter(
+        post_id__in=[pk for pk, _ in batch]
+    ).order_by('-created').values_list('post_id', 'text')
+    for post_id, text in rows:
+        comments.setdefault(post_id, []).append(text)
+    index.add_many(
+        (pk, text, '\n'.join(comments.get(pk, ()))) for pk, text in batch
+    )
+    return len(batch)
+
+
+def encode_search_cursor(score, pk):
+    """Непрозрачный токен курсора из пары (релевантность, id) поста."""
+    return encode_token(repr(score), pk)
+
+
+def decode_search_cursor(token):
+    """Разбор токена курсора, None для пустого или битого токена."""
+    parts = decode_token(token, 2)
+    if parts is None:
+        return None
+    score, pk = parts
+    try:
+        return float(score), int(pk)
+    except ValueError:
+        return None
+
+
+class SearchPaginator:
+    """Keyset-паджинатор результатов поиска по (релевантность, id).
+
+    Как и CursorPaginator, не считает общее число результатов;
+    переход возможен только вперёд и к первой странице.
+    """
+
+    def __init__(self, query, per_page):
+        self.terms = query_terms(query)
+        self.per_page = int(per_page)
+
+    def get_page(self, cursor):
+        after = decode_search_cursor(cursor)
+        rows = []
+        if self.terms:
+            rows = get_index().search(self.terms, after, self.per_page + 1)
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        posts = Post.objects.feed().in_bulk([pk for _, pk in rows])
+        object_list = [posts[pk] for _, pk in rows if pk in posts]
+        next_cursor = encode_search_cursor(*rows[-1]) if has_next else None
+        return CursorPage(
+            object_list, self, next_cursor, None, is_first=after is None
+        )
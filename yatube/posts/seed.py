@@ -0,0 +1,309 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Max, Min
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from .counters import recount_counters
+from .models import Comment, Follow, Group, Post, User
+from .rendering import rendered
+from .search import rebuild_index
+from .timeline import rebuild_timelines
+
+WORDS = (
+    'день', 'ночь', 'город', 'река', 'лес', 'дом', 'дорога', 'книга',
+    'музыка', 'кино', 'кофе', 'утро', 'вечер', 'друг', 'работа', 'отпуск',
+    'море', 'гора', 'поезд', 'самолёт', 'фото', 'котик', 'собака', 'погода',
+    'новость', 'идея', 'проект', 'код', 'ошибка', 'релиз', 'встреча',
+    'история', 'вопрос', 'ответ', 'мечта', 'сад', 'снег', 'дождь', 'солнце',
+    'весна', 'лето', 'осень', 'зима', 'красивый', 'новый', 'старый',
+    'быстрый', 'тихий', 'яркий', 'смешной', 'интересный', 'долгий',
+    'читать', 'писать', 'гулять', 'думать', 'смотреть', 'слушать', 'ехать',
+)
+PASSWORD = 'seed-password'
+PERIOD = timedelta(days=365)
+IMAGE_SIZE = (640, 480)
+IMAGE_POOL = 20
+FOLLOW_ROUNDS = 10
+
+
+def batched(objects, batch_size):
+    """Итератор списков по batch_size объектов из генератора."""
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def bulk_insert(model, objects, batch_size, **kwargs):
+    """bulk_create порциями: в памяти не больше batch_size объектов."""
+    created = 0
+    for batch in batched(objects, batch_size):
+        model.objects.bulk_create(batch, **kwargs)
+        created += len(batch)
+    return created
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключение auto_now_add, чтобы записать заданные даты."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def new_pks(model, create):
+    """Диапазон pk строк, добавленных create() в хвост таблицы.
+
+    Последовательность pk может начинаться не сразу за прежним
+    максимумом (AUTOINCREMENT помнит удалённые строки), поэтому
+    начало диапазона берётся по факту.
+    """
+    before = model.objects.aggregate(Max('pk'))['pk__max'] or 0
+    create()
+    added = model.objects.filter(pk__gt=before).aggregate(
+        first=Min('pk'), last=Max('pk')
+    )
+    if added['first'] is None:
+        return range(0)
+    return range(added['first'], added['last'] + 1)
+
+
+def text(rng, low, high):
+    """Предложение из случайных слов словаря."""
+    words = rng.choices(WORDS, k=rng.randint(low, high))
+    return ' '.join(words).capitalize()
+
+
+def generate_image(rng):
+    """JPEG с градиентом и случайными фигурами."""
+    start, end = ([rng.randrange(256) for _ in range(3)] for _ in range(2))
+    width, height = IMAGE_SIZE
+    image = Image.new('RGB', IMAGE_SIZE)
+    draw = ImageDraw.Draw(image)
+    for y in range(height):
+        draw.line((0, y, width, y), fill=tuple(
+            a + (b - a) * y // height for a, b in zip(start, end)
+        ))
+    for _ in range(rng.randint(3, 8)):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randint(20, 120)
+        draw.ellipse(
+            (x - radius, y - radius, x + radius, y + radius),
+            fill=tuple(rng.randrange(256) for _ in range(3)),
+        )
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def zipf_weights(count, alpha):
+    """Накопленные веса рангов 1..count по закону Ципфа 1 / k**alpha."""
+    return list(accumulate(1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+class Seeder:
+    """Генератор синтетических данных, детерминированный по seed.
+
+    Строки пишутся через bulk_create, поэтому сигналы не срабатывают:
+    счётчики, ленты подписок и поисковый индекс перестраиваются
+    целиком в конце, а кеш (страницы, поколения, count:posts)
+    очищается. pk новых строк считаются непрерывным
+    диапазоном - генератор рассчитан на единственного пишущего в БД.
+    """
+
+    def __init__(self, seed=0, batch_size=1000):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.now = timezone.now()
+        self.images = []
+
+    def run(self, users, groups, posts, comments, follows, index=True,
+            images=0.0, follow_alpha=1.0):
+        """Создание данных; images - доля постов с картинкой."""
+        self.user_pks = self.create_users(users)
+        self.group_pks = self.create_groups(groups)
+        if images:
+            self.images = self.create_images(min(IMAGE_POOL, posts))
+        self.post_pks = self.create_posts(posts, images)
+        created = {
+            'users': len(self.user_pks),
+            'groups': len(self.group_pks),
+            'posts': len(self.post_pks),
+            'comments': self.create_comments(comments),
+            'follows': self.create_follows(follows, follow_alpha),
+        }
+        recount_counters()
+        rebuild_timelines()
+        if index:
+            rebuild_index(self.batch_size)
+        cache.clear()
+        return created
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        prefix = f'seed{self.seed}_'
+        start = User.objects.filter(username__startswith=prefix).count()
+        objects = (
+            User(
+                username=f'{prefix}{number}',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            )
+            for number in range(start, start + count)
+        )
+        return new_pks(
+            User, lambda: bulk_insert(User, objects, self.batch_size)
+        )
+
+    def create_groups(self, count):
+        prefix = f'seed{self.seed}-'
+        start = Group.objects.filter(slug__startswith=prefix).count()
+        objects = (
+            Group(
+                title=f'Группа {number}',
+                slug=f'{prefix}{number}',
+                description=text(self.rng, 5, 20),
+            )
+            for number in range(start, start + count)
+        )
+        return new_pks(
+            Group, lambda: bulk_insert(Group, objects, self.batch_size)
+        )
+
+    def create_images(self, count):
+        """Общий для всех постов набор картинок в хранилище медиа.
+
+        Уже сохранённые файлы с тем же seed используются повторно:
+        пост ссылается на файл по имени, так что миллион постов
+        обходится в count файлов.
+        """
+        names = []
+        for number in range(count):
+            name = f'posts/seed/seed{self.seed}_{number}.jpg'
+            content = generate_image(self.rng)
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(content))
+            names.append(name)
+        return names
+
+    def random_date(self):
+        return self.now - PERIOD * self.rng.random()
+
+    def create_posts(self, count, images=0.0):
+        """Посты в хронологическом порядке pk, как при обычной работе."""
+        step = PERIOD / max(count, 1)
+        start = self.now - PERIOD
+
+        def objects():
+            for number in range(count):
+                group_id = None
+                if self.group_pks and self.rng.random() < 0.7:
+                    group_id = self.rng.choice(self.group_pks)
+                image = ''
+                if self.images and self.rng.random() < images:
+                    image = self.rng.choice(self.images)
+                author_id = self.rng.choice(self.user_pks)
+                body = text(self.rng, 10, 60)
+                yield Post(
+                    author_id=author_id,
+                    group_id=group_id,
+                    text=body,
+                    pub_date=start + step * number,
+                    image=image,
+                    **rendered(body, Post.rendered_fields),
+                )
+
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            return new_pks(
+                Post, lambda: bulk_insert(Post, objects(), self.batch_size)
+            )
+
+    def create_comments(self, count):
+        if not self.post_pks:
+            return 0
+
+        def objects():
+            for _ in range(count):
+                post_id = self.rng.choice(self.post_pks)
+                author_id = self.rng.choice(self.user_pks)
+                body = text(self.rng, 3, 20)
+                yield Comment(
+                    post_id=post_id,
+                    author_id=author_id,
+                    text=body,
+                    created=self.random_date(),
+                    **rendered(body, Comment.rendered_fields),
+                )
+
+        with explicit_dates(Comment._meta.get_field('created')):
+            return bulk_insert(Comment, objects(), self.batch_size)
+
+    def followed_authors(self, user_id, degree, authors, cum_weights):
+        """degree различных авторов, выбранных по популярности.
+
+        Если повторные выборки не набрали degree авторов, недостающие
+        берутся по порядку рангов - так подписчиков у популярных
+        авторов становится лишь больше.
+        """
+        followed = set()
+        for _ in range(FOLLOW_ROUNDS):
+            if len(followed) >= degree:
+                return sorted(followed)
+            followed.update(self.rng.choices(
+                authors, cum_weights=cum_weights, k=degree - len(followed)
+            ))
+            followed.discard(user_id)
+        rest = (
+            author_id for author_id in authors
+            if author_id != user_id and author_id not in followed
+        )
+        followed.update(islice(rest, degree - len(followed)))
+        return sorted(followed)
+
+    def follow_pairs(self, count, alpha=1.0):
+        """Пары (подписчик, автор) со степенным распределением подписчиков.
+
+        Авторы случайно ранжируются, автор ранга k выбирается с весом
+        1 / k**alpha: немногие популярные авторы собирают большую часть
+        подписок. Подписки распределяются между пользователями поровну
+        и генерируются по одному подписчику, поэтому в памяти хранятся
+        только веса авторов, а не весь граф.
+        """
+        authors = list(self.user_pks)
+        self.rng.shuffle(authors)
+        cum_weights = zipf_weights(len(authors), alpha)
+        per_user, extra = divmod(count, len(authors))
+        for index, user_id in enumerate(self.user_pks):
+            degree = min(per_user + (index < extra), len(authors) - 1)
+            for author_id in self.followed_authors(
+                user_id, degree, authors, cum_weights
+            ):
+                yield user_id, author_id
+
+    def create_follows(self, count, alpha=1.0):
+        if len(self.user_pks) < 2:
+            return 0
+        objects = (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in self.follow_pairs(count, alpha)
+        )
+        return bulk_insert(
+            Follow, objects, self.batch_size, ignore_conflicts=True
+        )
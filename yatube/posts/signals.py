@@ -0,0 +1,241 @@
+import threading
+
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .cache import (GLOBAL_SCOPE, TIMELINES_SCOPE, author_card_scope,
+                    author_scope, bump_generations, current_group_slug,
+                    followers_scope, group_card_scope, group_scope,
+                    invalidate_post, timeline_scope)
+from .counters import change_counter, change_user_counter
+from .follows import forget_following
+from .models import Comment, Follow, Group, Post, User, UserCounters
+from .search import index_comment, index_post, remove_post, unindex_comment
+from .timeline import (add_author_to_timeline, fan_out_post,
+                       followers_changed, remove_author_from_timeline,
+                       timelines_changed)
+
+_local = threading.local()
+
+
+def deleting_posts():
+    """id постов, удаляемых в этом потоке прямо сейчас."""
+    if not hasattr(_local, 'deleting_posts'):
+        _local.deleting_posts = set()
+    return _local.deleting_posts
+
+
+def is_last_login_update(update_fields):
+    return update_fields is not None and set(update_fields) == {'last_login'}
+
+
+@receiver(pre_save, sender=User)
+def user_before_save(sender, instance, update_fields, **kwargs):
+    """Запоминание прежнего имени пользователя."""
+    instance._previous_username = None
+    if instance.pk and not is_last_login_update(update_fields):
+        instance._previous_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, update_fields, **kwargs):
+    """Создание счётчиков нового пользователя и инвалидация кеша."""
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+    if is_last_login_update(update_fields):
+        return
+    scopes = [
+        GLOBAL_SCOPE, author_scope(instance.username),
+        author_card_scope(instance.username),
+    ]
+    previous_username = getattr(instance, '_previous_username', None)
+    if previous_username:
+        scopes.append(author_scope(previous_username))
+    if previous_username and previous_username != instance.username:
+        scopes.append(TIMELINES_SCOPE)
+    bump_generations(*scopes)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Инвалидация кеша профиля удалённого пользователя."""
+    bump_generations(GLOBAL_SCOPE, author_scope(instance.username))
+
+
+@receiver(pre_save, sender=Group)
+def group_before_save(sender, instance, **kwargs):
+    """Запоминание прежнего slug группы."""
+    instance._previous_slug = None
+    if instance.pk:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+def group_author_scopes(group):
+    """Области профилей авторов с постами в группе.
+
+    В карточках постов профиля выводятся название и slug группы.
+    """
+    usernames = User.objects.filter(post__group=group).values_list(
+        'username', flat=True
+    ).distinct()
+    return [author_scope(username) for username in usernames]
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    """Инвалидация кеша страниц с группой и профилей её авторов."""
+    scopes = [
+        GLOBAL_SCOPE, group_scope(instance.slug),
+        group_card_scope(instance.slug),
+    ]
+    previous_slug = getattr(instance, '_previous_slug', None)
+    if previous_slug:
+        scopes.append(group_scope(previous_slug))
+    if not created:
+        scopes.extend(group_author_scopes(instance))
+        scopes.append(TIMELINES_SCOPE)
+    bump_generations(*scopes)
+
+
+@receiver(pre_delete, sender=Group)
+def group_before_delete(sender, instance, **kwargs):
+    """Запоминание авторов до того, как посты потеряют группу."""
+    instance._author_scopes = group_author_scopes(instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    """Инвалидация кеша страниц удалённой группы и её авторов."""
+    bump_generations(
+        GLOBAL_SCOPE, TIMELINES_SCOPE, group_scope(instance.slug),
+        group_card_scope(instance.slug),
+        *getattr(instance, '_author_scopes', ())
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_group_before_save(sender, instance, **kwargs):
+    """Запоминание прежней группы редактируемого поста."""
+    instance._previous_group = (None, None)
+    if instance.pk:
+        instance._previous_group = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'group__slug').first() or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    """Раскладка по лентам, поисковый индекс, счётчики и кеш."""
+    index_post(instance.pk)
+    previous_group_id, previous_slug = getattr(
+        instance, '_previous_group', (None, None)
+    )
+    invalidate_post(instance, current_group_slug(instance), previous_slug)
+    if created:
+        change_user_counter(instance.author_id, 'posts_count', 1)
+        if instance.group_id:
+            change_counter(Group, instance.group_id, 'posts_count', 1)
+        fan_out_post(instance)
+        return
+    timelines_changed(instance.author_id)
+    if previous_group_id != instance.group_id:
+        if previous_group_id:
+            change_counter(Group, previous_group_id, 'posts_count', -1)
+        if instance.group_id:
+            change_counter(Group, instance.group_id, 'posts_count', 1)
+
+
+@receiver(pre_delete, sender=Post)
+def post_before_delete(sender, instance, **kwargs):
+    """Пометка поста, чтобы каскад комментариев не обновлял его."""
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Обновление счётчиков, индекса и кеша после удаления поста."""
+    deleting_posts().discard(instance.pk)
+    remove_post(instance.pk)
+    invalidate_post(instance, current_group_slug(instance))
+    timelines_changed(instance.author_id)
+    change_counter(UserCounters, instance.author_id, 'posts_count', -1)
+    if instance.group_id:
+        change_counter(Group, instance.group_id, 'posts_count', -1)
+
+
+@receiver(pre_save, sender=Comment)
+def comment_before_save(sender, instance, **kwargs):
+    """Запоминание прежнего текста редактируемого комментария."""
+    instance._previous_text = None
+    if instance.pk:
+        instance._previous_text = Comment.objects.filter(
+            pk=instance.pk
+        ).values_list('text', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    """Обновление счётчика комментариев, индекса поста и кеша.
+
+    В индекс пишутся только основы этого комментария, остальные
+    комментарии поста заново не разбираются.
+    """
+    previous_text = getattr(instance, '_previous_text', None)
+    if created:
+        change_counter(Post, instance.post_id, 'comments_count', 1)
+        index_comment(instance.post_id, instance.text)
+    elif previous_text != instance.text:
+        if previous_text is not None:
+            unindex_comment(instance.post_id, previous_text)
+        index_comment(instance.post_id, instance.text)
+    invalidate_post(instance.post, current_group_slug(instance.post))
+    timelines_changed(instance.post.author_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """Обновление счётчика, индекса и кеша после удаления комментария.
+
+    При каскадном удалении поста ничего не делает: индекс и кеш
+    поста обновит post_deleted.
+    """
+    if instance.post_id in deleting_posts():
+        return
+    change_counter(Post, instance.post_id, 'comments_count', -1)
+    unindex_comment(instance.post_id, instance.text)
+    invalidate_post(instance.post, current_group_slug(instance.post))
+    timelines_changed(instance.post.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    """Добавление постов автора в ленту нового подписчика."""
+    if created:
+        change_user_counter(instance.user_id, 'following_count', 1)
+        change_user_counter(instance.author_id, 'followers_count', 1)
+        followers_changed(instance.author_id)
+        add_author_to_timeline(instance.user_id, instance.author_id)
+        bump_generations(
+            followers_scope(instance.author.username),
+            timeline_scope(instance.user_id),
+        )
+        forget_following(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Удаление постов автора из ленты отписавшегося."""
+    change_counter(UserCounters, instance.user_id, 'following_count', -1)
+    change_counter(UserCounters, instance.author_id, 'followers_count', -1)
+    remove_author_from_timeline(instance.user_id, instance.author_id)
+    followers_changed(instance.author_id)
+    bump_generations(
+        followers_scope(instance.author.username),
+        timeline_scope(instance.user_id),
+    )
+    forget_following(instance.user_id)
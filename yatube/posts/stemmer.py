@@ -0,0 +1,106 @@
+"""Стеммер Портера (Snowball) для русского языка."""
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+
+def _endings(after_a=(), plain=()):
+    """Окончания от длинных к коротким; after_a - только после а/я."""
+    endings = [(ending, True) for ending in after_a]
+    endings += [(ending, False) for ending in plain]
+    return sorted(endings, key=lambda item: -len(item[0]))
+
+
+PERFECTIVE_GERUND = _endings(
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = _endings(plain=(
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = _endings(('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = _endings(plain=('ся', 'сь'))
+VERB = _endings(
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = _endings(plain=(
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+))
+SUPERLATIVE = _endings(plain=('ейш', 'ейше'))
+DERIVATIONAL = _endings(plain=('ост', 'ость'))
+
+
+def _strip(word, endings):
+    """Слово без самого длинного подходящего окончания или None."""
+    for ending, after_a in endings:
+        if word.endswith(ending):
+            rest = word[:-len(ending)]
+            if after_a and not rest.endswith(('а', 'я')):
+                return None
+            return rest
+    return None
+
+
+def _region(word, start):
+    """Начало области после первого сочетания гласная-согласная."""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _strip_inflection(rest):
+    """Шаг 1: деепричастие, либо возвратность и прилагательное/глагол/сущ."""
+    stripped = _strip(rest, PERFECTIVE_GERUND)
+    if stripped is not None:
+        return stripped
+    reflexive = _strip(rest, REFLEXIVE)
+    if reflexive is not None:
+        rest = reflexive
+    stripped = _strip(rest, ADJECTIVE)
+    if stripped is not None:
+        participle = _strip(stripped, PARTICIPLE)
+        return stripped if participle is None else participle
+    for endings in (VERB, NOUN):
+        stripped = _strip(rest, endings)
+        if stripped is not None:
+            return stripped
+    return rest
+
+
+def _tidy_up(rest):
+    """Шаг 4: удвоенная н, превосходная степень, мягкий знак."""
+    if rest.endswith('нн'):
+        return rest[:-1]
+    stripped = _strip(rest, SUPERLATIVE)
+    if stripped is not None:
+        return stripped[:-1] if stripped.endswith('нн') else stripped
+    if rest.endswith('ь'):
+        return rest[:-1]
+    return rest
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    """Основа русского слова; ё приводится к е."""
+    word = word.lower().replace('ё', 'е')
+    rv = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        len(word),
+    )
+    r2 = _region(word, _region(word, 0))
+    prefix, rest = word[:rv], _strip_inflection(word[rv:])
+    if rest.endswith('и'):
+        rest = rest[:-1]
+    stripped = _strip(rest, DERIVATIONAL)
+    if stripped is not None and rv + len(stripped) >= r2:
+        rest = stripped
+    return prefix + _tidy_up(rest)
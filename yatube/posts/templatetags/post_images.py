@@ -0,0 +1,65 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from yatube.settings import POST_IMAGE_SIZE
+
+from ..cache import current_group_slug, post_scopes
+from ..thumbnails import (FALLBACK_FORMAT, MIME_TYPES, get_renditions,
+                          worker)
+
+register = template.Library()
+
+PLACEHOLDER = 'img/placeholder.svg'
+SIZES = f'(max-width: {POST_IMAGE_SIZE[0]}px) 100vw, {POST_IMAGE_SIZE[0]}px'
+
+
+def srcset(thumbnails):
+    return ', '.join(
+        f'{thumbnail.url} {width}w' for width, thumbnail in thumbnails
+    )
+
+
+@register.simple_tag
+def post_image(post):
+    """Адаптивная картинка поста: <picture> с srcset по форматам.
+
+    Изображение в запросе не обрабатывается: пока нет запасной
+    JPEG-миниатюры, выводится заглушка, а картинка ставится в очередь
+    фоновой генерации.
+    """
+    if not post.image:
+        return ''
+    found = get_renditions(post.image)
+    fallback = found.pop(FALLBACK_FORMAT, None)
+    if not fallback:
+        worker.submit(
+            post.image.name, post_scopes(post, current_group_slug(post))
+        )
+        return format_html(
+            '<img class="card-img my-2" src="{}" width="{}" height="{}" '
+            'alt="{}">',
+            static(PLACEHOLDER),
+            *POST_IMAGE_SIZE,
+            'Изображение обрабатывается',
+        )
+    default_width, default_thumbnail = min(
+        fallback, key=lambda item: abs(item[0] - POST_IMAGE_SIZE[0])
+    )
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (MIME_TYPES[image_format], srcset(thumbnails), SIZES)
+            for image_format, thumbnails in found.items()
+        )
+    )
+    return format_html(
+        '<picture>{}<img class="card-img my-2" src="{}" srcset="{}" '
+        'sizes="{}" width="{}" height="{}" loading="lazy" alt=""></picture>',
+        sources,
+        default_thumbnail.url,
+        srcset(fallback),
+        SIZES,
+        default_thumbnail.width,
+        default_thumbnail.height,
+    )
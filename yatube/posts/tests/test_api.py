@@ -0,0 +1,237 @@
+import json
+from http import HTTPStatus
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User, UserCounters
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(3)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feeds_serialize_posts(self):
+        """Ленты отдают посты новыми сверху в виде JSON."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', kwargs={'slug': 'api-group'}),
+            reverse('posts:api_profile', kwargs={'username': 'Writer'}),
+            reverse('posts:api_follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.authorized_client.get(url).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [post.pk for post in reversed(self.posts)],
+                )
+                self.assertEqual(data['results'][-1], {
+                    'id': self.posts[0].pk,
+                    'text': 'Пост 0',
+                    'pub_date': data['results'][-1]['pub_date'],
+                    'author': 'Writer',
+                    'group': 'api-group',
+                    'image': None,
+                    'comments_count': 1,
+                })
+                self.assertIsNone(data['next_cursor'])
+
+    def test_feed_cursor_pagination(self):
+        """Курсор проходит ленту по одному посту без повторов."""
+        url = reverse('posts:api_index')
+        seen = []
+        cursor = ''
+        with patch('posts.api.P_PER_L', 1):
+            while cursor is not None:
+                data = self.client.get(url, {'cursor': cursor}).json()
+                seen += [post['id'] for post in data['results']]
+                cursor = data['next_cursor']
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+
+    def test_post_detail_with_comments(self):
+        """Пост отдаётся с комментариями, несуществующий - 404."""
+        url = reverse(
+            'posts:api_post_detail', kwargs={'post_id': self.posts[0].pk}
+        )
+        data = self.client.get(url).json()
+        self.assertEqual(data['text'], 'Пост 0')
+        self.assertEqual(data['comments'], [{
+            'id': self.comment.pk,
+            'text': 'Комментарий',
+            'created': data['comments'][0]['created'],
+            'author': 'Reader',
+        }])
+        response = self.client.get(
+            reverse('posts:api_post_detail', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn('detail', response.json())
+
+    def test_post_detail_comments_pagination(self):
+        """Комментарии поста отдаются страницами по курсору."""
+        post = self.posts[1]
+        comments = [
+            Comment.objects.create(
+                post=post, author=self.user, text=f'Комментарий {number}'
+            )
+            for number in range(3)
+        ]
+        url = reverse('posts:api_post_detail', kwargs={'post_id': post.pk})
+        seen = []
+        cursor = ''
+        with patch('posts.api.COMMENTS_PER_PAGE', 2):
+            while cursor is not None:
+                data = self.client.get(url, {'cursor': cursor}).json()
+                self.assertLessEqual(len(data['comments']), 2)
+                seen += [comment['id'] for comment in data['comments']]
+                cursor = data['next_cursor']
+        self.assertEqual(
+            seen, [comment.pk for comment in reversed(comments)]
+        )
+
+    def test_post_detail_etag_follows_author_and_group(self):
+        """ETag поста меняется вместе с его автором и группой."""
+        url = reverse(
+            'posts:api_post_detail', kwargs={'post_id': self.posts[0].pk}
+        )
+        etag = self.client.get(url)['ETag']
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response['ETag']
+        self.author.first_name = 'Автор'
+        self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_follow_feed_requires_login(self):
+        response = self.client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_conditional_get(self):
+        """Совпавший ETag или Last-Modified - 304, изменения - новый ETag."""
+        url = reverse('posts:api_profile', kwargs={'username': 'Writer'})
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        not_modified = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertNotEqual(
+            self.client.get(url, {'cursor': ''})['ETag'], etag
+        )
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['results']), 4)
+
+    def test_follow_feed_etag_follows_subscriptions(self):
+        """Отписка меняет ETag ленты подписок."""
+        url = reverse('posts:api_follow_index')
+        etag = self.authorized_client.get(url)['ETag']
+        Follow.objects.filter(user=self.user).delete()
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_follow_feed_etag_follows_timeline(self):
+        """ETag ленты подписок меняют только посты её авторов."""
+        url = reverse('posts:api_follow_index')
+        stranger = User.objects.create_user(username='Stranger')
+        etag = self.authorized_client.get(url)['ETag']
+        Post.objects.create(author=stranger, text='Чужой пост')
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Comment.objects.create(
+            post=self.posts[1], author=stranger, text='Комментарий'
+        )
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        UserCounters.objects.filter(user=self.author).update(fanout=False)
+        etag = self.authorized_client.get(url)['ETag']
+        Post.objects.create(author=self.author, text='Пост без раскладки')
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.json()['results']), 4)
+
+
+class FollowApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Follower')
+        cls.authors = [
+            User.objects.create_user(username=f'Author {number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('posts:api_follow_bulk')
+
+    def post(self, data):
+        return self.client.post(
+            self.url, json.dumps(data), content_type='application/json'
+        )
+
+    def test_bulk_follow_and_unfollow(self):
+        """Подписка и отписка списком имён, повтор ничего не меняет."""
+        data = self.post({
+            'follow': ['Author 0', 'Author 1', 'Author 2', 'Nobody'],
+        }).json()
+        self.assertEqual(
+            data['followed'], ['Author 0', 'Author 1', 'Author 2']
+        )
+        self.assertEqual(data['not_found'], ['Nobody'])
+        self.assertEqual(
+            UserCounters.objects.get(user=self.user).following_count, 3
+        )
+        data = self.post({
+            'follow': ['Author 0'], 'unfollow': ['Author 1', 'Author 1'],
+        }).json()
+        self.assertEqual(data['followed'], [])
+        self.assertEqual(data['unfollowed'], ['Author 1'])
+        self.assertEqual(
+            set(Follow.objects.values_list('author__username', flat=True)),
+            {'Author 0', 'Author 2'},
+        )
+
+    def test_bulk_follow_rejects_bad_requests(self):
+        self.assertEqual(self.post({'follow': 'Author 0'}).status_code, 400)
+        self.assertEqual(self.post([1, 2]).status_code, 400)
+        self.assertEqual(
+            self.client.get(self.url).status_code,
+            HTTPStatus.METHOD_NOT_ALLOWED,
+        )
+        self.client.logout()
+        self.assertEqual(
+            self.post({'follow': []}).status_code, HTTPStatus.UNAUTHORIZED
+        )
@@ -0,0 +1,146 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from yatube.settings import COUNT_REFRESH_INTERVAL, EXACT_COUNT_BELOW
+
+from ..cache import author_scope, get_generations, group_scope
+from ..counters import COUNT_KEY, cached_count
+from ..models import Comment, Follow, Group, Post, User, UserCounters
+from ..paginators import EstimatedPaginator
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Counter Author')
+        cls.reader = User.objects.create_user(username='Counter Reader')
+        cls.group = Group.objects.create(
+            title='Первая группа',
+            slug='counters_first',
+            description='Описание группы',
+        )
+        cls.group_other = Group.objects.create(
+            title='Вторая группа',
+            slug='counters_second',
+            description='Описание группы',
+        )
+
+    def assertCounters(self, user, **expected):
+        counters = UserCounters.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(user=user, field=field):
+                self.assertEqual(getattr(counters, field), value)
+
+    def test_counters_follow_post_and_comment_lifecycle(self):
+        """Тестирование счётчиков при создании и удалении объектов."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        comment = Comment.objects.create(
+            author=self.reader, post=post, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCounters(self.author, posts_count=1, followers_count=1)
+        self.assertCounters(self.reader, following_count=1)
+        self.group.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertCounters(self.author, followers_count=0)
+        self.assertCounters(self.reader, following_count=0)
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertCounters(self.author, posts_count=0)
+
+    def test_counters_follow_group_change_and_stale_save(self):
+        """Тестирование переноса поста в группу и сохранения копии."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Comment.objects.create(author=self.reader, post=post, text='Текст')
+        post.group = self.group_other
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.group.refresh_from_db()
+        self.group_other.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.group_other.posts_count, 1)
+
+    def test_recount_counters_command(self):
+        """Тестирование команды проверки и пересчёта счётчиков."""
+        Post.objects.create(author=self.author, text='Пост', group=self.group)
+        call_command('recount_counters', '--check', stdout=StringIO())
+        UserCounters.objects.filter(user=self.author).update(posts_count=7)
+        Group.objects.filter(pk=self.group.pk).update(posts_count=0)
+        with self.assertRaises(CommandError):
+            call_command('recount_counters', '--check', stdout=StringIO())
+        scopes = (
+            author_scope(self.author.username), group_scope(self.group.slug)
+        )
+        before = get_generations(*scopes)
+        call_command('recount_counters', stdout=StringIO())
+        call_command('recount_counters', '--check', stdout=StringIO())
+        self.assertCounters(self.author, posts_count=1)
+        after = get_generations(*scopes)
+        for scope in scopes:
+            with self.subTest(scope=scope):
+                self.assertGreater(after[scope], before[scope])
+
+
+class EstimatedCountsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Estimate Author')
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Пост {number}')
+            for number in range(3)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_estimate_falls_back_to_exact_count(self):
+        """Небольшая оценка заменяется точным COUNT(*)."""
+        paginator = EstimatedPaginator(Post.objects.all(), 2, estimate=1)
+        self.assertEqual(paginator.count, 3)
+        self.assertEqual(paginator.num_pages, 2)
+
+    def test_large_estimate_skips_count_query(self):
+        """Большая оценка используется без запроса к БД."""
+        estimate = EXACT_COUNT_BELOW * 10
+        paginator = EstimatedPaginator(
+            Post.objects.all(), 10, estimate=lambda: estimate
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.num_pages, EXACT_COUNT_BELOW)
+
+    def test_cached_count_refreshes_stale_value_in_background(self):
+        """Число строк считается один раз, устаревшее - пересчитывается."""
+        queryset = Post.objects.all()
+        with patch('posts.counters.count_refresher.submit') as submit:
+            self.assertEqual(cached_count('posts', queryset), 3)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(cached_count('posts', queryset), 3)
+            self.assertEqual(len(queries), 0)
+            submit.assert_not_called()
+            value, counted_at = cache.get(COUNT_KEY.format('posts'))
+            cache.set(
+                COUNT_KEY.format('posts'),
+                (value, counted_at - COUNT_REFRESH_INTERVAL - 1),
+                None,
+            )
+            self.assertEqual(cached_count('posts', queryset), 3)
+        submit.assert_called_once_with('posts', queryset)
@@ -1,13 +1,17 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
+from unittest.mock import patch
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Comment, Group, Post, User
+from ..thumbnails import worker
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -42,6 +46,7 @@ class PostsFormsTests(TestCase):
 
     @classmethod
     def tearDownClass(cls):
+        worker.join()
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
@@ -210,6 +215,10 @@ class PostsFormsTests(TestCase):
             post.text,
             edit_data['text']
         )
+        self.assertEqual(
+            post.text_html,
+            f'<p>{edit_data["text"]}</p>'
+        )
         self.assertEqual(
             post.author,
             self.user
@@ -250,6 +259,86 @@ class PostsFormsTests(TestCase):
                 self.assertEqual(Post.objects.count(), posts_count)
 
 
+def make_image(size, image_format='PNG', exif=None):
+    buffer = BytesIO()
+    image = Image.new('RGB', size, color=(10, 120, 200))
+    options = {'exif': exif} if exif else {}
+    image.save(buffer, image_format, **options)
+    extension = image_format.lower()
+    return SimpleUploadedFile(
+        name=f'upload.{extension}',
+        content=buffer.getvalue(),
+        content_type=f'image/{extension}',
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadLimitsFormsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        worker.join()
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с загрузкой', 'image': image},
+        )
+
+    def test_upload_too_large_rejected(self):
+        """Файл больше MAX_UPLOAD_SIZE отклоняется с понятной ошибкой."""
+        with patch('posts.uploads.MAX_UPLOAD_SIZE', 1024 * 1024):
+            response = self.create_post(
+                SimpleUploadedFile('big.png', b'\0' * 2 * 1024 * 1024)
+            )
+        self.assertFormError(response, 'form', 'image', 'Файл больше 1 МБ')
+        self.assertFalse(Post.objects.exists())
+
+    def test_upload_too_many_pixels_rejected(self):
+        """Картинка с лишними пикселями отклоняется по заголовку."""
+        with patch('posts.uploads.MAX_IMAGE_PIXELS', 1000 * 1000):
+            response = self.create_post(make_image((2000, 1000)))
+        self.assertFormError(
+            response, 'form', 'image', 'Изображение больше 1 Мпикс'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_upload_resized_and_exif_stripped(self):
+        """Большой оригинал уменьшается, EXIF удаляется."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        with patch('posts.uploads.MAX_IMAGE_SIDE', 400):
+            self.create_post(make_image((1000, 500), 'JPEG', exif))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (400, 200))
+            self.assertFalse(image.getexif())
+
+    def test_upload_truncated_image_rejected(self):
+        """Обрезанный JPEG отклоняется ошибкой формы, а не падением."""
+        image = make_image((1000, 500), 'JPEG')
+        content = image.read()
+        truncated = SimpleUploadedFile(
+            image.name, content[:len(content) // 2], image.content_type
+        )
+        with patch('posts.uploads.MAX_IMAGE_SIDE', 400):
+            response = self.create_post(truncated)
+        self.assertFormError(
+            response, 'form', 'image', 'Файл изображения повреждён'
+        )
+        self.assertFalse(Post.objects.exists())
+
+
 class CommentFormsTests(TestCase):
     @classmethod
     def setUpClass(cls):
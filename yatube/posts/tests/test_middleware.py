@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Cached Author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='cached', description='Описание'
+        )
+        Post.objects.create(author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        patcher = patch.object(
+            SessionMiddleware, 'process_request', autospec=True,
+            side_effect=SessionMiddleware.process_request,
+        )
+        self.process_request = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=1',
+            reverse('posts:index') + '?cursor=',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:api_index'),
+        )
+
+    def test_anonymous_pages_served_before_session(self):
+        """Повторный анонимный запрос отдаётся до сессии и без БД."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.process_request.reset_mock()
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.process_request.assert_not_called()
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second['ETag'], first['ETag'])
+                self.assertEqual(second['X-Frame-Options'], 'SAMEORIGIN')
+                self.assertEqual(
+                    second['X-Frame-Options'], first['X-Frame-Options']
+                )
+                not_modified = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=first['ETag']
+                )
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_content_change_invalidates_pages(self):
+        """Новый пост сразу виден анонимным пользователям."""
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        self.client.get(url)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_cursor_and_page_parameters_are_separate_pages(self):
+        """Параметры page и cursor входят в ключ, прочие - нет."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.assertIn('page_obj', self.client.get(url + '?cursor=').context)
+        self.process_request.reset_mock()
+        self.client.get(url + '?utm_source=mail')
+        self.process_request.assert_not_called()
+
+    def test_authorized_users_get_personal_pages(self):
+        """Страница из кеша анонимов не отдаётся пользователю."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        authorized_client = Client()
+        authorized_client.force_login(self.author)
+        response = authorized_client.get(url)
+        self.assertContains(response, 'Cached Author')
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_disabled_by_zero_timeout(self):
+        url = reverse('posts:index')
+        with patch('posts.middleware.ANONYMOUS_CACHE_TIMEOUT', 0):
+            self.client.get(url)
+            self.process_request.reset_mock()
+            self.client.get(url)
+        self.process_request.assert_called_once()
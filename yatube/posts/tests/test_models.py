@@ -1,6 +1,13 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from yatube.settings import POST_EXCERPT_LENGTH
+
+from ..cache import (GLOBAL_SCOPE, author_scope, get_generations,
+                     post_scope)
+from ..models import Comment, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -47,3 +54,63 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     self.post._meta.get_field(value).help_text, expected)
+
+
+class RenderedTextModelTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='render')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Первый <b>абзац</b>\n\nВторой\n' + 'слово ' * 100,
+        )
+        cls.comment = Comment.objects.create(
+            author=cls.user, post=cls.post, text='Строка\nещё <i>одна</i>'
+        )
+
+    def test_html_rendered_on_save(self):
+        """HTML и отрывок текста отрисовываются при сохранении."""
+        self.assertTrue(self.post.text_html.startswith(
+            '<p>Первый &lt;b&gt;абзац&lt;/b&gt;</p>\n\n<p>Второй<br>'
+        ))
+        self.assertLess(len(self.post.excerpt_html), len(self.post.text_html))
+        self.assertIn('…', self.post.excerpt_html)
+        self.assertTrue(self.post.truncated)
+        self.assertLess(
+            len(self.post.excerpt_html), POST_EXCERPT_LENGTH + 100
+        )
+        self.assertEqual(
+            self.comment.text_html,
+            '<p>Строка<br>ещё &lt;i&gt;одна&lt;/i&gt;</p>',
+        )
+        self.post.text = 'Новый текст'
+        self.post.save(update_fields=['text'])
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text_html, '<p>Новый текст</p>')
+        self.assertEqual(post.excerpt_html, '<p>Новый текст</p>')
+        self.assertFalse(post.truncated)
+
+    def test_render_texts_command_fills_rows(self):
+        """Команда render_texts заполняет HTML строк пачками."""
+        expected = Post.objects.get(pk=self.post.pk).text_html
+        Post.objects.update(text_html='', excerpt_html='')
+        Comment.objects.update(text_html='')
+        scopes = (
+            GLOBAL_SCOPE, post_scope(self.post.pk),
+            author_scope(self.user.username),
+        )
+        before = get_generations(*scopes)
+        call_command(
+            'render_texts', '--missing', '--batch-size', '1',
+            stdout=StringIO(),
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text_html, expected)
+        self.assertNotEqual(post.excerpt_html, '')
+        self.assertNotEqual(
+            Comment.objects.get(pk=self.comment.pk).text_html, ''
+        )
+        after = get_generations(*scopes)
+        for scope in scopes:
+            with self.subTest(scope=scope):
+                self.assertGreater(after[scope], before[scope])
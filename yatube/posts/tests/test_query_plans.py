@@ -0,0 +1,107 @@
+import re
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def bad_plan_steps(sql):
+    """Шаги плана с полным сканированием таблицы или сортировкой."""
+    return [
+        step for step in query_plan(sql)
+        if FULL_SCAN_RE.match(step) or TEMP_SORT in step
+    ]
+
+
+class QueryPlansTests(TestCase):
+    """Запросы страниц не сканируют таблицы целиком и не сортируют.
+
+    Планы строятся SQLite для реальных SQL, выполненных при рендере;
+    поиск не проверяется - ранжирование по релевантности требует
+    сортировки найденного.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Planner')
+        cls.author = User.objects.create_user(username='Planned Author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='plans', description='Описание'
+        )
+        for number in range(3):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            Comment.objects.create(
+                post=post, author=cls.user, text=f'Комментарий {number}'
+            )
+        cls.post = post
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_views_use_indexes(self):
+        """Запросы всех страниц с лентами выполняются по индексам."""
+        author = self.author.username
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + '?cursor=',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': author}),
+            reverse('posts:profile', kwargs={'username': author})
+            + '?cursor=',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + '?cursor=',
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:api_profile', kwargs={'username': author}),
+            reverse('posts:api_follow_index'),
+            reverse('posts:api_post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:profile_unfollow', kwargs={'username': author}),
+            reverse('posts:profile_follow', kwargs={'username': author}),
+        ]
+        for url in urls:
+            self.assert_queries_use_indexes(url)
+
+    def test_cursor_pages_use_indexes(self):
+        """Следующие страницы курсорной пагинации идут по индексам."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        ]
+        with patch('posts.views.P_PER_L', 1):
+            for url in urls:
+                response = self.authorized_client.get(url + '?cursor=')
+                cursor = response.context['page_obj'].next_cursor
+                self.assert_queries_use_indexes(f'{url}?cursor={cursor}')
+
+    def assert_queries_use_indexes(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            with self.subTest(url=url, sql=sql):
+                self.assertEqual(bad_plan_steps(sql), [])
@@ -0,0 +1,165 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post, SearchTerm, User
+from ..search import FTS5Index, TermIndex, get_index, rebuild_index
+from ..stemmer import stem
+
+
+class StemmerTests(TestCase):
+    def test_stem_word_forms(self):
+        """Словоформы приводятся к общей основе."""
+        forms = {
+            'котиков': 'котик',
+            'котики': 'котик',
+            'красивая': 'красив',
+            'смеялись': 'смея',
+            'великолепнейшего': 'великолепн',
+            'Ёлки': 'елк',
+        }
+        for word, expected in forms.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class SearchViewsMixin:
+    """Общие тесты поиска для обоих вариантов индекса."""
+    index_class = None
+    use_fts5 = True
+
+    def setUp(self):
+        cache.clear()
+        patcher = patch('posts.search.SEARCH_USE_FTS5', self.use_fts5)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.assertIsInstance(get_index(), self.index_class)
+        self.user = User.objects.create_user(username='Searcher')
+        self.in_text = Post.objects.create(
+            author=self.user, text='Фотографии котиков и собак'
+        )
+        self.in_comment = Post.objects.create(
+            author=self.user, text='Прогулка по парку'
+        )
+        Comment.objects.create(
+            post=self.in_comment, author=self.user, text='Там был котик'
+        )
+        Post.objects.create(author=self.user, text='Совсем другой пост')
+
+    def search(self, query, cursor=None):
+        data = {'q': query}
+        if cursor:
+            data['cursor'] = cursor
+        return self.client.get(reverse('posts:search'), data)
+
+    def test_search_ranks_post_text_above_comments(self):
+        """Найдены посты по тексту и комментариям, текст поста важнее."""
+        response = self.search('котик')
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.in_text, self.in_comment],
+        )
+
+    def test_search_requires_all_terms(self):
+        """Пост должен содержать все слова запроса."""
+        response = self.search('котики собаки')
+        self.assertEqual(list(response.context['page_obj']), [self.in_text])
+
+    def test_search_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при редактировании и удалении."""
+        self.in_text.text = 'Фотографии птиц'
+        self.in_text.save()
+        self.in_comment.comments.all().delete()
+        self.assertFalse(self.search('котик').context['page_obj'])
+        self.in_text.delete()
+        self.assertFalse(self.search('птицы').context['page_obj'])
+
+    def test_search_index_follows_comment_changes(self):
+        """Основы комментария добавляются и убираются по одному."""
+        first = self.in_comment.comments.get()
+        second = Comment.objects.create(
+            post=self.in_comment, author=self.user, text='Котик спал'
+        )
+        first.delete()
+        self.assertEqual(
+            list(self.search('котик').context['page_obj']),
+            [self.in_text, self.in_comment],
+        )
+        second.text = 'Никаких животных'
+        second.save()
+        self.assertEqual(
+            list(self.search('котик').context['page_obj']), [self.in_text]
+        )
+        self.assertEqual(
+            list(self.search('животные').context['page_obj']),
+            [self.in_comment],
+        )
+
+    def test_post_delete_skips_comment_cascade(self):
+        """Каскад комментариев не переиндексирует удаляемый пост."""
+        for text in ('Раз', 'Два'):
+            Comment.objects.create(
+                post=self.in_comment, author=self.user, text=text
+            )
+        with patch('posts.signals.unindex_comment') as unindex, \
+                patch('posts.signals.invalidate_post') as invalidate:
+            self.in_comment.delete()
+        unindex.assert_not_called()
+        invalidate.assert_called_once()
+        self.assertFalse(self.search('котик прогулка').context['page_obj'])
+
+    def test_search_cursor_pagination(self):
+        """Курсор проходит все результаты без повторов."""
+        with patch('posts.views.P_PER_L', 1):
+            first = self.search('котик').context['page_obj']
+            second = self.search('котик', first.next_cursor).context[
+                'page_obj'
+            ]
+        self.assertEqual(list(first) + list(second), [
+            self.in_text, self.in_comment
+        ])
+        self.assertTrue(first.is_first)
+        self.assertFalse(second.has_next())
+        self.assertFalse(second.is_first)
+        self.assertFalse(second.has_previous())
+
+    def test_rebuild_index(self):
+        """Полная переиндексация восстанавливает индекс."""
+        get_index().clear()
+        self.assertFalse(self.search('котик').context['page_obj'])
+        self.assertEqual(rebuild_index(batch_size=2), 3)
+        self.assertEqual(len(self.search('котик').context['page_obj']), 2)
+
+
+class FTS5SearchViewsTests(SearchViewsMixin, TestCase):
+    index_class = FTS5Index
+
+
+class TermIndexSearchViewsTests(SearchViewsMixin, TestCase):
+    index_class = TermIndex
+    use_fts5 = False
+
+    def test_term_index_rows(self):
+        """Основы слов хранятся в SearchTerm с весами."""
+        weights = dict(
+            SearchTerm.objects.filter(
+                post=self.in_comment
+            ).values_list('term', 'weight')
+        )
+        self.assertEqual(weights['прогулк'], 2.0)
+        self.assertEqual(weights['котик'], 1.0)
+
+    def test_term_index_comment_weights(self):
+        """Веса основ комментария прибавляются и вычитаются."""
+        comment = Comment.objects.create(
+            post=self.in_comment, author=self.user, text='Котик и котики'
+        )
+        terms = SearchTerm.objects.filter(post=self.in_comment)
+        self.assertEqual(terms.get(term='котик').weight, 3.0)
+        comment.delete()
+        self.assertEqual(terms.get(term='котик').weight, 1.0)
+        self.in_comment.comments.all().delete()
+        self.assertFalse(terms.filter(term='котик').exists())
+        self.assertTrue(terms.filter(term='прогулк').exists())
@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+from io import StringIO
+from statistics import median
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db.models import Count, F, Min
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, User
+from ..seed import Seeder
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class SeedTests(TestCase):
+    def snapshot(self):
+        """Тексты постов и граф подписок относительно первого pk."""
+        first = User.objects.aggregate(Min('pk'))['pk__min']
+        posts = list(Post.objects.order_by('pk').values_list(
+            'text', F('author_id') - first
+        ))
+        follows = list(Follow.objects.order_by('pk').values_list(
+            F('user_id') - first, F('author_id') - first
+        ))
+        return posts, follows
+
+    def test_same_seed_same_data(self):
+        """Одинаковое зерно даёт одинаковые данные."""
+        sizes = dict(users=8, groups=2, posts=20, comments=10, follows=20)
+        snapshots = []
+        for _ in range(2):
+            Seeder(seed=3, batch_size=7).run(**sizes)
+            snapshots.append(self.snapshot())
+            for model in (Comment, Follow, Post, User):
+                model.objects.all().delete()
+        self.assertEqual(snapshots[0], snapshots[1])
+
+    def test_run_clears_cached_pages(self):
+        """Созданные посты видны сразу, без устаревшего кеша."""
+        cache.clear()
+        self.client.get(reverse('posts:index'))
+        Seeder(seed=2).run(
+            users=3, groups=1, posts=5, comments=0, follows=0, index=False
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 5)
+
+    def test_follow_graph_is_skewed(self):
+        """Подписчики распределены степенно, без подписок на себя."""
+        created = Seeder(seed=1).run(
+            users=60, groups=0, posts=0, comments=0, follows=600,
+            index=False, follow_alpha=1.2,
+        )
+        self.assertEqual(created['follows'], 600)
+        self.assertEqual(Follow.objects.count(), 600)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        followers = list(User.objects.annotate(
+            followers=Count('following')
+        ).values_list('followers', flat=True))
+        self.assertGreaterEqual(max(followers), 4 * median(followers))
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+    def test_command_with_images(self):
+        """Команда создаёт посты с картинками из общего набора файлов."""
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+        call_command(
+            'seed_yatube', users=5, groups=1, posts=30, comments=10,
+            follows=10, images=1.0, stdout=StringIO(),
+        )
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 10)
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertLessEqual(len(images), 20)
+        for name in images:
+            self.assertTrue(default_storage.exists(name))
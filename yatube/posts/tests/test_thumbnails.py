@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post, User
+from ..templatetags.post_images import PLACEHOLDER
+from ..thumbnails import get_renditions, image_formats, worker
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_png(size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=(200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        name='big.png', content=buffer.getvalue(), content_type='image/png'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TransactionTestCase):
+    """Без общей транзакции теста: поток генерации пишет в БД."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Image Author')
+        self.post = Post.objects.create(
+            author=self.user, text='Пост с картинкой', image=make_png()
+        )
+
+    def tearDown(self):
+        worker.join()
+
+    def test_placeholder_until_rendition_is_generated(self):
+        """Заглушка вместо картинки, пока миниатюра не готова."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        self.assertContains(response, PLACEHOLDER)
+        worker.join()
+        renditions = get_renditions(self.post.image)
+        self.assertEqual(set(renditions), set(image_formats()))
+        sizes = [
+            (thumbnail.width, thumbnail.height)
+            for _, thumbnail in renditions['JPEG']
+        ]
+        self.assertEqual(sizes, [(480, 170), (960, 339), (1440, 508)])
+        response = self.client.get(url)
+        self.assertNotContains(response, PLACEHOLDER)
+        self.assertContains(response, '<picture>')
+        for width, thumbnail in renditions['JPEG']:
+            with self.subTest(width=width):
+                self.assertContains(response, f'{thumbnail.url} {width}w')
+
+    def test_renditions_survive_cache_clear(self):
+        """Метаданные миниатюр хранятся в БД, а не только в кеше."""
+        worker.submit(self.post.image.name)
+        worker.join()
+        self.assertEqual(
+            set(get_renditions(self.post.image)), set(image_formats())
+        )
+        cache.clear()
+        self.assertEqual(
+            set(get_renditions(self.post.image)), set(image_formats())
+        )
+
+    def test_image_formats_skip_unsupported(self):
+        """Форматы без поддержки в Pillow не используются."""
+        with patch('posts.thumbnails.POST_IMAGE_FORMATS', ('NOPE', 'PNG')):
+            self.assertEqual(image_formats(), ['PNG', 'JPEG'])
@@ -1,12 +1,23 @@
+from unittest.mock import patch
+
 from django import forms
+from django.conf import settings
 from django.core.cache import cache
 from django.core.cache.backends import locmem
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import render
 from django.urls import reverse
 
-from yatube.settings import P_PER_L
+from yatube.settings import PAGE_LINKS, P_PER_L
 
-from ..models import Comment, Follow, Group, Post, User
+from ..cache import attach_generations
+from ..follows import FOLLOWING_KEY, follow, following_ids
+from ..models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                      UserCounters)
+from ..timeline import rebalance_author
+from ..paginators import elided_page_range
 
 
 class PostsViewsTests(TestCase):
@@ -162,14 +173,71 @@ class PostsViewsTests(TestCase):
         )
         self.assertNotIn(self.post, response.context['page_obj'])
 
-    def test_views_index_cache_page_20_seconds(self):
-        """Проверка кеширования списка постов страницы index."""
+    def test_views_index_cached_until_content_changes(self):
+        """Проверка кеширования страницы index до изменения постов."""
+        cache.clear()
         self.assertEqual(not locmem._caches[''], True)
         response = self.authorized_client.get(reverse('posts:index'))
         self.correct_context_for_post_page_obj(response)
         response_second = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response_second.context, None)
+        self.assertEqual(response_second.content, response.content)
         self.assertEqual(not locmem._caches[''], False)
+        new_post = Post.objects.create(
+            author=self.user_author,
+            text='Новый пост сбрасывает кеш',
+        )
+        response_third = self.authorized_client.get(reverse('posts:index'))
+        self.assertIn(new_post, response_third.context['page_obj'])
+        self.assertContains(response_third, new_post.text)
+
+    def test_views_cache_key_ignores_unread_parameters(self):
+        """Параметры, которые view не читает, не дают новых ключей кеша."""
+        cache.clear()
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(f'{url}?utm_source=mail')
+        self.assertIsNone(response.context)
+        response = self.authorized_client.get(f'{url}?page=2')
+        self.assertIsNotNone(response.context)
+
+    def test_views_post_fragments_invalidated_on_edit(self):
+        """Проверка сброса кеша фрагментов поста при его изменении."""
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user_author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        self.post.text = 'Отредактированный текст'
+        self.post.save()
+        Comment.objects.create(
+            author=self.user, post=self.post, text='Свежий комментарий'
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Отредактированный текст')
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_views_post_card_kept_until_author_or_group_saved(self):
+        """Карточку не сбрасывают соседние посты, сбрасывает смена группы."""
+        def card():
+            post = Post.objects.feed().get(pk=self.post.pk)
+            return attach_generations([post])[0].generation
+
+        before = card()
+        Post.objects.create(
+            author=self.user_author, group=self.group, text='Соседний пост'
+        )
+        self.assertEqual(card(), before)
+        self.group.title = 'Переименованная группа'
+        self.group.save()
+        self.assertNotEqual(card(), before)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Переименованная группа')
 
 
 class PaginatorViewsTests(TestCase):
@@ -237,6 +305,163 @@ class PaginatorViewsTests(TestCase):
                 response = self.client.get(reverse_name)
                 check_paginator(response)
 
+    def test_page_links_are_elided(self):
+        """Тестирование ограниченной навигации по номерам страниц."""
+        self.assertEqual(elided_page_range(2, 5), [1, 2, 3, 4, 5])
+        self.assertEqual(
+            elided_page_range(50, 100, limit=9),
+            [1, None, 48, 49, 50, 51, 52, None, 100],
+        )
+        self.assertEqual(
+            elided_page_range(4, 100, limit=9),
+            [1, 2, 3, 4, 5, 6, None, 100],
+        )
+        for number in range(1, 1001):
+            links = elided_page_range(number, 1000)
+            self.assertLessEqual(len(links), PAGE_LINKS)
+            self.assertIn(number, links)
+        with patch('posts.views.P_PER_L', 1):
+            response = self.client.get(reverse('posts:index'), {'page': 8})
+        self.assertEqual(
+            response.context['page_obj'].page_links,
+            elided_page_range(8, Post.objects.count()),
+        )
+        self.assertContains(response, '&hellip;')
+
+    def test_cursor_paginator_walks_all_posts(self):
+        """Тестирование курсорной пагинации вперёд и назад."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+        for reverse_name in self.names_templates.keys():
+            with self.subTest(reverse_name=reverse_name):
+                seen = []
+                pages = []
+                cursor = ''
+                while True:
+                    response = self.client.get(
+                        reverse_name, {'cursor': cursor}
+                    )
+                    page_obj = response.context['page_obj']
+                    self.assertTrue(page_obj.cursor_mode)
+                    self.assertLessEqual(len(page_obj), P_PER_L)
+                    pages.append([post.pk for post in page_obj])
+                    seen.extend(pages[-1])
+                    if not page_obj.has_next():
+                        break
+                    cursor = page_obj.next_cursor
+                self.assertEqual(seen, expected)
+                response = self.client.get(
+                    reverse_name, {'cursor': page_obj.previous_cursor}
+                )
+                self.assertEqual(
+                    [post.pk for post in response.context['page_obj']],
+                    pages[-2]
+                )
+
+    def test_cursor_paginator_skips_count_query(self):
+        """Тестирование отсутствия COUNT в курсорном режиме."""
+        with CaptureQueriesContext(connection) as queries:
+            page_obj = self.client.get(
+                reverse('posts:index'), {'cursor': 'garbage'}
+            ).context['page_obj']
+        self.assertEqual(len(page_obj), P_PER_L)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(*)', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+
+class ExcerptViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Long Writer')
+        cls.long_post = Post.objects.create(
+            author=cls.user, text='Начало. ' + 'хвост ' * 200 + 'КОНЕЦ'
+        )
+        cls.short_post = Post.objects.create(
+            author=cls.user, text='Короткий пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_render_excerpt_without_text_column(self):
+        """Ленты выбирают и выводят только отрывок текста."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'Long Writer'}),
+        )
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.long_post.pk}
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                feed_sql = [
+                    query['sql'] for query in queries.captured_queries
+                    if '"posts_post"."excerpt_html"' in query['sql']
+                ]
+                self.assertTrue(feed_sql)
+                for sql in feed_sql:
+                    self.assertNotIn('"posts_post"."text"', sql)
+                    self.assertNotIn('"posts_post"."text_html"', sql)
+                self.assertContains(response, 'Начало.')
+                self.assertNotContains(response, 'КОНЕЦ')
+                self.assertContains(response, 'Короткий пост')
+                self.assertContains(response, 'Читать далее', count=1)
+                self.assertContains(response, f'href="{detail_url}"')
+        self.assertContains(self.client.get(detail_url), 'КОНЕЦ')
+
+
+class HolePunchingViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Hole Author')
+        cls.reader = User.objects.create_user(username='Hole Reader')
+        cls.post = Post.objects.create(author=cls.author, text='Общий пост')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        self.edit_url = reverse(
+            'posts:post_edit', kwargs={'post_id': self.post.pk}
+        )
+
+    def test_post_detail_rendered_once_for_all_users(self):
+        """Страница поста общая, персональные части - у каждого свои."""
+        author = Client()
+        author.force_login(self.author)
+        reader = Client()
+        reader.force_login(self.reader)
+        with patch('posts.views.render', wraps=render) as view_render:
+            author_response = author.get(self.url)
+            reader_response = reader.get(self.url)
+            guest_response = self.client.get(self.url)
+        view_render.assert_called_once()
+        for response in (author_response, reader_response, guest_response):
+            self.assertContains(response, 'Общий пост')
+            self.assertNotContains(response, '<!--hole:')
+        self.assertContains(author_response, self.edit_url)
+        self.assertContains(author_response, 'Пользователь: Hole Author')
+        self.assertNotContains(reader_response, self.edit_url)
+        self.assertContains(reader_response, 'Пользователь: Hole Reader')
+        self.assertContains(reader_response, 'csrfmiddlewaretoken')
+        self.assertIn(settings.CSRF_COOKIE_NAME, reader_response.cookies)
+        self.assertNotContains(guest_response, 'csrfmiddlewaretoken')
+        self.assertContains(guest_response, 'Войти')
+
+    def test_post_detail_cache_follows_post_changes(self):
+        """Изменение поста сразу видно на закешированной странице."""
+        self.client.get(self.url)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'Исправленный пост')
+
 
 class SubscriptionsViewsTests(TestCase):
     @classmethod
@@ -369,3 +594,340 @@ class SubscriptionsViewsTests(TestCase):
         response = self.authorized_client3.get(reverse('posts:follow_index'))
         page = response.context['page_obj']
         self.assertNotIn(post, page)
+
+    def test_views_timeline_rebuilt_on_follow_and_unfollow(self):
+        """Тестирование перестроения ленты при подписке и отписке."""
+        post = Post.objects.create(author=self.post_author, text='Пост')
+        self.authorized_client1.get(self.url_follow2)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.subscriber, post=post
+        ).exists())
+        self.authorized_client1.get(self.url_unfollow2)
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.subscriber
+        ).exists())
+
+    def test_views_popular_author_read_on_request(self):
+        """Тестирование чтения постов популярного автора без раскладки."""
+        Follow.objects.create(user=self.subscriber, author=self.post_author)
+        UserCounters.objects.filter(user=self.post_author).update(
+            fanout=False
+        )
+        post = Post.objects.create(author=self.post_author, text='Пост')
+        response = self.authorized_client1.get(reverse('posts:follow_index'))
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_views_timeline_follows_popularity_threshold(self):
+        """Раскладка переключается в фоне, между порогами - без изменений."""
+        feed = reverse('posts:follow_index')
+        third = User.objects.create_user(username='Third_user')
+        followers = (self.subscriber, self.other_user, third)
+        with patch('posts.timeline.FANOUT_FOLLOWERS_LIMIT', 2), \
+                patch('posts.timeline.FANOUT_RESUME_LIMIT', 1), \
+                patch('posts.timeline.timeline_rebalancer.submit') as submit, \
+                patch('posts.timeline.transaction.on_commit',
+                      lambda callback: callback()):
+            for user in followers:
+                Follow.objects.create(user=user, author=self.post_author)
+            submit.assert_called_once_with(self.post_author.pk)
+            rebalance_author(self.post_author.pk)
+            post = Post.objects.create(author=self.post_author, text='Пост')
+            self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+            submit.reset_mock()
+            Follow.objects.filter(user=third).delete()
+            submit.assert_not_called()
+            self.assertIn(
+                post, self.authorized_client3.get(feed).context['page_obj']
+            )
+            Follow.objects.filter(user=self.subscriber).delete()
+            submit.assert_called_once_with(self.post_author.pk)
+            rebalance_author(self.post_author.pk)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.other_user, post=post
+        ).exists())
+        self.assertIn(
+            post, self.authorized_client3.get(feed).context['page_obj']
+        )
+
+
+class FeedQueriesViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=f'Feed Author {number}')
+            for number in range(1, 21)
+        ]
+        cls.reader = User.objects.create_user(username='Feed Reader')
+        cls.group = Group.objects.create(
+            title='Группа для теста запросов',
+            slug='feed_queries',
+            description='Описание группы',
+        )
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {author}', group=cls.group)
+            for author in cls.authors
+        )
+        Follow.objects.bulk_create(
+            Follow(user=cls.reader, author=author) for author in cls.authors
+        )
+        Comment.objects.bulk_create(
+            Comment(author=cls.reader, post=post, text='Комментарий')
+            for post in Post.objects.all()
+        )
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.authors[0].username}),
+            reverse('posts:follow_index'),
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def count_queries(self, url, per_page):
+        cache.clear()
+        with patch('posts.views.P_PER_L', per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        self.assertLessEqual(len(response.context['page_obj']), per_page)
+        return len(queries)
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        """Тестирование постоянного числа запросов на страницу ленты."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url, 2),
+                    self.count_queries(url, 20),
+                )
+
+    def test_feed_posts_have_comment_count(self):
+        """Тестирование аннотации числа комментариев в ленте."""
+        response = self.client.get(reverse('posts:follow_index'))
+        for post in response.context['page_obj']:
+            with self.subTest(post=post.pk):
+                self.assertEqual(post.comments_count, 1)
+
+
+class ConditionalViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Conditional Reader')
+        cls.author = User.objects.create_user(username='Conditional Author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='conditional', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_not_modified_without_rendering(self):
+        """Совпавший ETag - 304 без рендера шаблона."""
+        for client in (self.client, self.authorized_client):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    client.get(url)
+                    etag = client.get(url)['ETag']
+                    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertFalse(response.templates)
+
+    def test_new_comment_changes_validators(self):
+        """Комментарий меняет ETag страниц с постом."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_group_rename_changes_profile(self):
+        """Переименование группы обновляет профили её авторов."""
+        url = self.urls[2]
+        etag = self.client.get(url)['ETag']
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новое название')
+
+    def test_validators_change_again_on_commit(self):
+        """После коммита транзакции поколения сдвигаются ещё раз."""
+        url = self.urls[-1]
+        with patch('posts.cache.transaction.on_commit') as on_commit:
+            Comment.objects.create(
+                post=self.post, author=self.user, text='Комментарий'
+            )
+        etag = self.client.get(url)['ETag']
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        """У анонима и пользователя разные ETag одной страницы."""
+        url = self.urls[-1]
+        self.assertNotEqual(
+            self.client.get(url)['ETag'],
+            self.authorized_client.get(url)['ETag'],
+        )
+
+    def test_cache_control(self):
+        """Анонимные ответы публичные, авторизованные - приватные."""
+        url = self.urls[0]
+        anonymous = self.client.get(url)
+        self.assertIn('public', anonymous['Cache-Control'])
+        self.assertIn('Cookie', anonymous['Vary'])
+        authorized = self.authorized_client.get(url)
+        self.assertIn('private', authorized['Cache-Control'])
+        self.assertIn('Cookie', authorized['Vary'])
+
+
+class CommentsPaginationViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Popular Author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.commenters = [
+            User.objects.create_user(username=f'Commenter {number}')
+            for number in range(5)
+        ]
+        for number in range(5):
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.commenters[number],
+                text=f'Комментарий {number}',
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def comment_texts(self, response):
+        return [comment.text for comment in response.context['comments']]
+
+    def test_comments_are_paginated_with_authors(self):
+        """Комментарии постранично, авторы без отдельных запросов."""
+        with patch('posts.views.COMMENTS_PER_PAGE', 2):
+            with CaptureQueriesContext(connection) as two:
+                response = self.client.get(self.url)
+            cache.clear()
+            with patch('posts.views.COMMENTS_PER_PAGE', 5):
+                with CaptureQueriesContext(connection) as five:
+                    self.client.get(self.url)
+        self.assertEqual(
+            self.comment_texts(response), ['Комментарий 4', 'Комментарий 3']
+        )
+        self.assertEqual(len(two), len(five))
+        self.assertContains(response, 'js-more-comments')
+
+    def test_fragment_and_fallback_load_next_comments(self):
+        """Следующая страница - фрагментом или параметром comments."""
+        with patch('posts.views.COMMENTS_PER_PAGE', 2):
+            cursor = self.client.get(self.url).context['comments'].next_cursor
+            fragment = self.client.get(
+                reverse('posts:post_comments',
+                        kwargs={'post_id': self.post.pk}),
+                {'cursor': cursor},
+            )
+            self.assertEqual(
+                self.comment_texts(fragment),
+                ['Комментарий 2', 'Комментарий 1'],
+            )
+            self.assertContains(fragment, 'Комментарий 1')
+            self.assertTemplateNotUsed(fragment, 'base.html')
+            cache.clear()
+            page = self.client.get(self.url, {'comments': cursor})
+            self.assertEqual(
+                self.comment_texts(page), self.comment_texts(fragment)
+            )
+
+    def test_fragment_of_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class FollowStateViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='State Reader')
+        cls.author = User.objects.create_user(username='State Author')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': self.author.username}
+        )
+
+    def follow_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        follow_table = Follow._meta.db_table
+        return response.context['following'], [
+            query for query in queries.captured_queries
+            if f'FROM "{follow_table}"' in query['sql']
+        ]
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка и отписка не меняют данные."""
+        follow_url = reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        )
+        unfollow_url = reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        )
+        for _ in range(2):
+            self.client.get(follow_url)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.author.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.followers_count, 1)
+        for _ in range(2):
+            self.client.get(unfollow_url)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_profile_reads_following_from_cache(self):
+        """Признак подписки в профиле берётся из кеша подписок."""
+        Follow.objects.create(user=self.user, author=self.author)
+        following, queries = self.follow_queries(self.profile_url)
+        self.assertTrue(following)
+        self.assertEqual(len(queries), 1)
+        following, queries = self.follow_queries(self.profile_url + '?page=1')
+        self.assertTrue(following)
+        self.assertEqual(queries, [])
+        Follow.objects.all().delete()
+        following, _ = self.follow_queries(self.profile_url + '?page=1')
+        self.assertFalse(following)
+
+    def test_following_forgotten_again_on_commit(self):
+        """После коммита кеш подписок сбрасывается ещё раз."""
+        with patch('posts.follows.transaction.on_commit') as on_commit:
+            follow(self.user, self.author)
+        cache.set(FOLLOWING_KEY.format(self.user.pk), frozenset(), None)
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        self.assertEqual(following_ids(self.user.pk), {self.author.pk})
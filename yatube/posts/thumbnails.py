@@ -0,0 +1,180 @@
+import threading
+from functools import partial
+
+from django.db import transaction
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.background import BackgroundQueue
+from yatube.settings import (POST_IMAGE_FORMATS, POST_IMAGE_OPTIONS,
+                             POST_IMAGE_SIZE, POST_IMAGE_WIDTHS,
+                             THUMBNAIL_WORKERS)
+
+from .cache import bump_generations, current_group_slug, post_scopes
+
+FALLBACK_FORMAT = 'JPEG'
+FORMAT_EXTENSIONS = {**EXTENSIONS, 'AVIF': 'avif'}
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+
+class CachedDBKVStore(KVStore):
+    """Хранилище ключей sorl-thumbnail в БД с кешем Django перед ней.
+
+    Метаданные миниатюр не теряются при вытеснении из кеша. В отличие
+    от cached_db промахи не кешируются: миниатюру создаёт фоновый
+    поток, и запомненное отсутствие скрывало бы готовую миниатюру.
+    Записи в БД идут под блокировкой, чтобы потоки генерации
+    не спорили за таблицу.
+    """
+
+    lock = threading.Lock()
+
+    def _get_raw(self, key):
+        value = self.cache.get(key)
+        if value is None:
+            value = KVStoreModel.objects.filter(key=key).values_list(
+                'value', flat=True
+            ).first()
+            if value is not None:
+                self.cache.set(
+                    key, value, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+                )
+        return value
+
+    def _set_raw(self, key, value):
+        with self.lock:
+            super()._set_raw(key, value)
+
+
+class RenditionBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail с поиском уже готовой миниатюры."""
+
+    def _prepare_options(self, source, options):
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        """Имя файла миниатюры; в отличие от sorl знает и про AVIF."""
+        key = tokey(source.key, geometry_string, serialize(options))
+        path = f'{key[:2]}/{key[2:4]}/{key}'
+        extension = FORMAT_EXTENSIONS[options['format']]
+        return f'{thumbnail_settings.THUMBNAIL_PREFIX}{path}.{extension}'
+
+    def get_existing_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None; изображение не декодируется."""
+        source = ImageFile(file_)
+        options = self._prepare_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def create_thumbnails(self, file_, geometries):
+        """Все миниатюры из одного декодирования исходника.
+
+        get_thumbnail открывает исходник заново для каждой миниатюры,
+        здесь же он декодируется один раз на весь набор.
+        """
+        source = ImageFile(file_)
+        source_image = default.engine.get_image(source)
+        try:
+            source.set_size(default.engine.get_image_size(source_image))
+            image_info = default.engine.get_image_info(source_image)
+            for geometry_string, options in geometries:
+                options = self._prepare_options(source, dict(options))
+                name = self._get_thumbnail_filename(
+                    source, geometry_string, options
+                )
+                thumbnail = ImageFile(name, default.storage)
+                if not thumbnail.exists():
+                    options['image_info'] = image_info
+                    self._create_thumbnail(
+                        source_image, geometry_string, options, thumbnail
+                    )
+                default.kvstore.get_or_set(source)
+                default.kvstore.set(thumbnail, source)
+        finally:
+            default.engine.cleanup(source_image)
+
+
+def image_formats():
+    """Форматы миниатюр, которые умеет сохранять установленный Pillow."""
+    Image.init()
+    formats = [name for name in POST_IMAGE_FORMATS if name in Image.SAVE]
+    if FALLBACK_FORMAT not in formats:
+        formats.append(FALLBACK_FORMAT)
+    return formats
+
+
+def rendition_geometry(width):
+    base_width, base_height = POST_IMAGE_SIZE
+    return f'{width}x{round(width * base_height / base_width)}'
+
+
+def renditions():
+    """Набор (формат, ширина, геометрия, опции) всех миниатюр поста."""
+    for image_format in image_formats():
+        for width in POST_IMAGE_WIDTHS:
+            options = dict(POST_IMAGE_OPTIONS, format=image_format)
+            yield image_format, width, rendition_geometry(width), options
+
+
+def get_renditions(image):
+    """Готовые миниатюры картинки: {формат: [(ширина, миниатюра), ...]}.
+
+    Изображение при этом не открывается - только поиск в kvstore.
+    """
+    found = {}
+    for image_format, width, geometry, options in renditions():
+        thumbnail = default.backend.get_existing_thumbnail(
+            image, geometry, **options
+        )
+        if thumbnail is not None:
+            found.setdefault(image_format, []).append((width, thumbnail))
+    return found
+
+
+def generate_renditions(image_name):
+    """Генерация всех настроенных миниатюр изображения."""
+    default.backend.create_thumbnails(image_name, [
+        (geometry, options) for _, _, geometry, options in renditions()
+    ])
+
+
+def render_post_image(image_name, scopes=()):
+    """Задача фоновой очереди: миниатюры, затем новые поколения областей.
+
+    Страницы поста с заглушкой вместо картинки перерисовываются.
+    """
+    generate_renditions(image_name)
+    bump_generations(*scopes)
+
+
+worker = BackgroundQueue(
+    'rendition-worker', render_post_image, THUMBNAIL_WORKERS
+)
+
+
+def schedule_renditions(post):
+    """Постановка миниатюр поста в очередь после коммита транзакции."""
+    if not post.image:
+        return
+    scopes = post_scopes(post, current_group_slug(post))
+    transaction.on_commit(partial(worker.submit, post.image.name, scopes))
@@ -0,0 +1,196 @@
+from django.db import connection, transaction
+from django.db.models import Case, F, Q, When
+
+from core.background import BackgroundQueue
+from yatube.settings import FANOUT_FOLLOWERS_LIMIT, FANOUT_RESUME_LIMIT
+
+from .cache import TIMELINES_SCOPE, bump_generations, timeline_scope
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+BATCH_SIZE = 500
+
+
+def is_fanout_author(author_id):
+    """Раскладываются ли посты автора по лентам при публикации."""
+    fanout = UserCounters.objects.filter(
+        user_id=author_id
+    ).values_list('fanout', flat=True).first()
+    return fanout is not False
+
+
+def fan_out_post(post):
+    """Добавление нового поста в ленты подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    bump_generations(*(timeline_scope(user_id) for user_id in followers))
+
+
+def timelines_changed(author_id):
+    """Сдвиг поколений лент подписчиков после изменения постов автора.
+
+    Только для автора с раскладкой: число его подписчиков ограничено
+    FANOUT_FOLLOWERS_LIMIT. Ленты с постами популярного автора
+    зависят от его author_scope.
+    """
+    if not is_fanout_author(author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    bump_generations(*(timeline_scope(user_id) for user_id in followers))
+
+
+def add_author_to_timeline(user_id, author_id):
+    """Перестроение ленты после подписки: посты автора в ленту."""
+    if not is_fanout_author(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def needs_rebalance(fanout, followers):
+    """Нужно ли переключить раскладку автора (с гистерезисом).
+
+    Раскладка выключается при числе подписчиков больше
+    FANOUT_FOLLOWERS_LIMIT и включается снова, только когда их
+    не больше FANOUT_RESUME_LIMIT: подписка и отписка у порога
+    не перестраивают ленты туда и обратно.
+    """
+    if fanout:
+        return followers > FANOUT_FOLLOWERS_LIMIT
+    return followers <= FANOUT_RESUME_LIMIT
+
+
+def followers_changed(author_id):
+    """Постановка перестроения лент автора в очередь после коммита."""
+    row = UserCounters.objects.filter(user_id=author_id).values_list(
+        'fanout', 'followers_count'
+    ).first()
+    if row is not None and needs_rebalance(*row):
+        transaction.on_commit(
+            lambda: timeline_rebalancer.submit(author_id)
+        )
+
+
+def rebalance_author(author_id):
+    """Задача фоновой очереди: включение или выключение раскладки.
+
+    При выключении посты автора сразу читаются из Post, а разложенные
+    записи удаляются. При включении ленты всех подписчиков дополняются
+    его постами (в том числе подписавшихся за это время).
+    """
+    row = UserCounters.objects.filter(user_id=author_id).values_list(
+        'fanout', 'followers_count'
+    ).first()
+    if row is None or not needs_rebalance(*row):
+        return
+    fanout = not row[0]
+    UserCounters.objects.filter(user_id=author_id).update(fanout=fanout)
+    if fanout:
+        backfill_author(author_id)
+    else:
+        TimelineEntry.objects.filter(post__author_id=author_id).delete()
+
+
+timeline_rebalancer = BackgroundQueue('timeline-rebalancer', rebalance_author)
+
+
+def backfill_author(author_id):
+    """Посты автора в ленты всех его подписчиков."""
+    posts = list(
+        Post.objects.filter(author_id=author_id).values_list('pk', 'pub_date')
+    )
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for user_id in followers.iterator()
+            for pk, pub_date in posts
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_author_from_timeline(user_id, author_id):
+    """Перестроение ленты после отписки: посты автора из ленты."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild_timelines():
+    """Перестроение всех лент из подписок одним INSERT ... SELECT.
+
+    Нужно после массовой загрузки через bulk_create, которая
+    не вызывает сигналы; счётчики подписчиков должны быть актуальны.
+    Раскладка включается авторам не больше чем с FANOUT_FOLLOWERS_LIMIT
+    подписчиков.
+    """
+    UserCounters.objects.update(fanout=Case(
+        When(followers_count__gt=FANOUT_FOLLOWERS_LIMIT, then=False),
+        default=True,
+    ))
+    TimelineEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            f'(user_id, post_id, pub_date) '
+            f'SELECT follow.user_id, post.id, post.pub_date '
+            f'FROM {Follow._meta.db_table} follow '
+            f'JOIN {Post._meta.db_table} post '
+            f'ON post.author_id = follow.author_id '
+            f'LEFT JOIN {UserCounters._meta.db_table} counters '
+            f'ON counters.user_id = follow.author_id '
+            f'WHERE COALESCE(counters.fanout, %s)',
+            [True]
+        )
+        created = cursor.rowcount
+    bump_generations(TIMELINES_SCOPE)
+    return created
+
+
+def timeline_posts(user):
+    """Посты ленты подписок пользователя.
+
+    Посты обычных авторов читаются из материализованной ленты
+    в порядке её индекса, посты авторов с огромным числом
+    подписчиков - напрямую из Post.
+    """
+    followed = Follow.objects.filter(user=user).values('author_id')
+    popular_authors = list(
+        UserCounters.objects.filter(
+            user_id__in=followed, fanout=False
+        ).values_list('user_id', flat=True)
+    )
+    if not popular_authors:
+        return Post.objects.filter(timeline_entries__user=user).order_by(
+            F('timeline_entries__pub_date').desc(),
+            F('timeline_entries__post').desc(),
+        )
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=entries) | Q(author_id__in=popular_authors)
+    )
@@ -0,0 +1,145 @@
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, ImageOps
+
+from yatube.settings import (FILE_UPLOAD_MAX_MEMORY_SIZE, MAX_IMAGE_PIXELS,
+                             MAX_IMAGE_SIDE, MAX_UPLOAD_SIZE)
+
+HEADER_SIZE = 64 * 1024
+JPEG_QUALITY = 90
+MB = 1024 * 1024
+BROKEN_IMAGE_ERROR = 'Файл изображения повреждён'
+
+
+def size_error():
+    return f'Файл больше {MAX_UPLOAD_SIZE / MB:g} МБ'
+
+
+def pixels_error():
+    return f'Изображение больше {MAX_IMAGE_PIXELS / 1e6:g} Мпикс'
+
+
+class RejectedUpload(UploadedFile):
+    """Отклонённый при приёме файл: содержимое не сохранено."""
+
+    def __init__(self, name, content_type, size, reason):
+        super().__init__(BytesIO(), name, content_type, size)
+        self.rejected_reason = reason
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Обработчик загрузки, ограничивающий размер и число пикселей.
+
+    Стоит первым в FILE_UPLOAD_HANDLERS: пропускает данные дальше
+    стандартным обработчикам, пока файл в пределах MAX_UPLOAD_SIZE.
+    Размеры картинки читаются из заголовка по первым HEADER_SIZE байт,
+    без декодирования. Остаток отклонённого файла отбрасывается,
+    а вместо него в форму приходит RejectedUpload с причиной.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.rejected_reason = None
+        if self.content_length and self.content_length > MAX_UPLOAD_SIZE:
+            self.rejected_reason = size_error()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.rejected_reason:
+            return None
+        self.received += len(raw_data)
+        if self.received > MAX_UPLOAD_SIZE:
+            self.rejected_reason = size_error()
+            return None
+        if self.header is not None:
+            self.header += raw_data[:HEADER_SIZE - len(self.header)]
+            self.rejected_reason = self.check_header()
+            if self.rejected_reason:
+                return None
+        return raw_data
+
+    def check_header(self):
+        """Проверка числа пикселей, как только заголовок прочитан."""
+        try:
+            width, height = Image.open(BytesIO(self.header)).size
+        except Image.DecompressionBombError:
+            return pixels_error()
+        except Exception:
+            if len(self.header) >= HEADER_SIZE:
+                self.header = None
+            return None
+        self.header = None
+        if width * height > MAX_IMAGE_PIXELS:
+            return pixels_error()
+        return None
+
+    def file_complete(self, file_size):
+        if not self.rejected_reason:
+            return None
+        return RejectedUpload(
+            self.file_name, self.content_type, self.received,
+            self.rejected_reason
+        )
+
+
+def needs_processing(image):
+    if getattr(image, 'is_animated', False):
+        return False
+    return max(image.size) > MAX_IMAGE_SIDE or bool(image.getexif())
+
+
+def normalize_image(upload):
+    """Картинка без EXIF и не больше MAX_IMAGE_SIDE по длинной стороне.
+
+    Для JPEG draft декодирует сразу в уменьшенном масштабе, остальные
+    форматы уменьшаются через reduce (reducing_gap в thumbnail).
+    Результат пишется во временный файл, который хранилище
+    копирует частями. Файлы без EXIF и в пределах размера не
+    перекодируются.
+    """
+    if not isinstance(upload, UploadedFile):
+        return upload
+    upload.seek(0)
+    try:
+        resized = resize_image(upload)
+    except (OSError, KeyError, ValueError, Image.DecompressionBombError):
+        raise forms.ValidationError(BROKEN_IMAGE_ERROR)
+    if resized is None:
+        upload.seek(0)
+        return upload
+    output, size = resized
+    return UploadedFile(output, upload.name, upload.content_type, size)
+
+
+def resize_image(upload):
+    """Перекодированная картинка и её размер или None, если не нужно.
+
+    Повреждённый файл может пройти verify() в ImageField и упасть
+    только при декодировании: ошибки Pillow обрабатывает
+    normalize_image.
+    """
+    image = Image.open(upload)
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        raise forms.ValidationError(pixels_error())
+    if not needs_processing(image):
+        return None
+    image_format = image.format
+    image.draft('RGB', (MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), reducing_gap=3.0)
+    image.info.pop('exif', None)
+    options = {}
+    if image_format == 'JPEG':
+        options['quality'] = JPEG_QUALITY
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+    output = SpooledTemporaryFile(max_size=FILE_UPLOAD_MAX_MEMORY_SIZE)
+    image.save(output, image_format, **options)
+    size = output.tell()
+    output.seek(0)
+    return output, size
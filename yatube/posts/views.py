@@ -1,28 +1,74 @@
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.utils.functional import SimpleLazyObject
 
-from yatube.settings import P_PER_L
+from core.holes import punch_holes
+from yatube.settings import (COMMENTS_PER_PAGE, CURSOR_PAGINATION, P_PER_L,
+                             PAGE_CACHE_TIMEOUT)
 
+from .cache import (GLOBAL_SCOPE, attach_generations, author_scope,
+                    followers_scope, generation_cache_page, generation_stamp,
+                    group_scope, post_scope, shared_cache_page, versioned)
+from .counters import cached_count, get_user_counters
+from .follows import follow, following_ids, unfollow
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Group, Post, User
+from .paginators import CursorPaginator, EstimatedPaginator, page_links
+from .search import SearchPaginator
+from .thumbnails import schedule_renditions
+from .timeline import timeline_posts
 
 
-def paginator_func(posts, per_list, request):
-    """Паджинатор."""
-    paginator = Paginator(posts, per_list)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def paginator_func(posts, per_list, request, estimate=None):
+    """Паджинатор.
+
+    Курсорный режим включается настройкой CURSOR_PAGINATION
+    или параметром ?cursor= в запросе. Постраничный режим
+    готовит page_links - ограниченную навигацию по номерам;
+    с estimate (число или функция) число постов оценивается
+    без COUNT(*), иначе считается точно.
+    """
+    if CURSOR_PAGINATION or 'cursor' in request.GET:
+        paginator = CursorPaginator(posts, per_list)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    else:
+        if estimate is None:
+            paginator = Paginator(posts, per_list)
+        else:
+            paginator = EstimatedPaginator(posts, per_list, estimate)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+        page_obj.page_links = page_links(page_obj)
+    attach_generations(page_obj)
     return page_obj
 
 
-@cache_page(20, key_prefix='index_page')
+def post_page_scopes(request, post_id):
+    """Области страницы поста: сам пост, его автор и группа."""
+    scopes = [post_scope(post_id)]
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if row is not None:
+        username, slug = row
+        scopes.append(author_scope(username))
+        if slug:
+            scopes.append(group_scope(slug))
+    return scopes
+
+
+@versioned(lambda request: [GLOBAL_SCOPE])
+@generation_cache_page(GLOBAL_SCOPE)
 def index(request):
     """Рендер главной страницы."""
     template = 'posts/index.html'
-    posts = Post.objects.all()
-    page_obj = paginator_func(posts, P_PER_L, request)
+    posts = Post.objects.feed()
+    page_obj = paginator_func(
+        posts, P_PER_L, request,
+        estimate=lambda: cached_count('posts', Post.objects.all()),
+    )
     context = {
         'page_obj': page_obj,
         'index': 'index',
@@ -30,12 +76,16 @@ def index(request):
     return render(request, template, context)
 
 
+@versioned(lambda request, slug: [group_scope(slug)])
+@generation_cache_page(group_scope('{slug}'))
 def group_posts(request, slug):
     """Рендер страницы сообщества."""
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.group_posts.all()
-    page_obj = paginator_func(posts, P_PER_L, request)
+    posts = group.group_posts.feed()
+    page_obj = paginator_func(
+        posts, P_PER_L, request, estimate=group.posts_count
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -43,17 +93,23 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@versioned(lambda request, username: [
+    author_scope(username), followers_scope(username)
+])
+@generation_cache_page(
+    author_scope('{username}'), followers_scope('{username}')
+)
 def profile(request, username):
     """Рендер страницы профайла."""
     template = 'posts/profile.html'
     user = get_object_or_404(User, username=username)
-    posts = user.post.all()
-    counter = posts.count()
-    page_obj = paginator_func(posts, P_PER_L, request)
-    following = False
-    if request.user.is_authenticated:
-        subscriptions = request.user.follower.values()
-        following = subscriptions.filter(author_id=user.id).exists()
+    posts = user.post.feed()
+    counter = get_user_counters(user).posts_count
+    page_obj = paginator_func(posts, P_PER_L, request, estimate=counter)
+    following = (
+        request.user.is_authenticated
+        and user.pk in following_ids(request.user.pk)
+    )
     context = {
         'author': user,
         'counter': counter,
@@ -63,18 +119,65 @@ def profile(request, username):
     return render(request, template, context)
 
 
+def comments_page(post_id, cursor):
+    """Страница комментариев поста, выбираемая только при обращении.
+
+    Пока фрагмент комментариев есть в кеше, запрос к БД не нужен.
+    """
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).order_by('-created', '-pk')
+    return SimpleLazyObject(
+        lambda: CursorPaginator(comments, COMMENTS_PER_PAGE).get_page(cursor)
+    )
+
+
+@versioned(post_page_scopes)
+@punch_holes(lambda request: {'form': CommentForm()})
+@shared_cache_page(post_page_scopes, parameters=('comments',))
 def post_detail(request, post_id):
-    """Рендер страницы поста."""
+    """Рендер страницы поста.
+
+    Страница одна на всех пользователей и кешируется целиком;
+    шапка, форма комментария и ссылка на редактирование -
+    персональные дыры, заполняемые при каждом ответе.
+    """
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
-    counter = post.author.post.count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group').defer(
+            'excerpt_html'
+        ),
+        id=post_id
+    )
+    counter = get_user_counters(post.author).posts_count
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    cursor = request.GET.get('comments', '')
     context = {
         'post': post,
         'counter': counter,
         'form': form,
-        'comments': comments,
+        'comments': comments_page(post.pk, cursor),
+        'cursor': cursor,
+        'comments_timeout': PAGE_CACHE_TIMEOUT,
+        'generation': generation_stamp(post_scope(post.pk)),
+    }
+    return render(request, template, context)
+
+
+@versioned(lambda request, post_id: [post_scope(post_id)])
+@generation_cache_page(post_scope('{post_id}'), parameters=('cursor',))
+def post_comments(request, post_id):
+    """Фрагмент со следующей страницей комментариев поста."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404('Пост не найден')
+    template = 'posts/includes/comment_list.html'
+    cursor = request.GET.get('cursor', '')
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(post_id, cursor),
+        'cursor': cursor,
+        'comments_timeout': PAGE_CACHE_TIMEOUT,
+        'generation': generation_stamp(post_scope(post_id)),
     }
     return render(request, template, context)
 
@@ -91,6 +194,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         form.save()
+        schedule_renditions(post)
         return redirect('posts:profile', username=post.author)
     return render(request, template, {'form': form})
 
@@ -108,7 +212,7 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        schedule_renditions(form.save())
         return redirect('posts:post_detail', post_id)
     return render(request, template, {'form': form,
                                       'is_edit': True})
@@ -131,7 +235,7 @@ def add_comment(request, post_id):
 def follow_index(request):
     """Страница с постами авторов, на которых подписан user."""
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts = timeline_posts(request.user).feed()
     page_obj = paginator_func(posts, P_PER_L, request)
     context = {
         'page_obj': page_obj,
@@ -140,17 +244,26 @@ def follow_index(request):
     return render(request, template, context)
 
 
+def search(request):
+    """Рендер страницы поиска по постам и комментариям."""
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = SearchPaginator(query, P_PER_L)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 @login_required
 def profile_follow(request, username):
     """Подписка на автора."""
     post_author = get_object_or_404(User, username=username)
-    if request.user == post_author:
-        return redirect('posts:profile', username=username)
-    subscriptions = request.user.follower.values()
-    if not subscriptions.filter(author_id=post_author.id).exists():
-        subscription = Follow(user=request.user, author=post_author)
-        subscription.save()
-        return redirect('posts:profile', username=username)
+    follow(request.user, post_author)
     return redirect('posts:profile', username=username)
 
 
@@ -158,11 +271,5 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     """Отписаться от автора."""
     post_author = get_object_or_404(User, username=username)
-    if request.user == post_author:
-        return redirect('posts:profile', username=username)
-    subscriptions = request.user.follower.values()
-    if subscriptions.filter(author_id=post_author.id).exists():
-        unsubscribe = request.user.follower.get(author=post_author)
-        unsubscribe.delete()
-        return redirect('posts:profile', username=username)
+    unfollow(request.user, post_author)
     return redirect('posts:profile', username=username)
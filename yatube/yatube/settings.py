@@ -34,13 +34,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Заголовки безопасности ставятся и ответам из кеша анонимных страниц
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -53,7 +57,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -109,6 +113,19 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки: первым стоит обработчик с ограничениями размера файла
+# и числа пикселей (проверяются до декодирования). Оригиналы больше
+# MAX_IMAGE_SIDE по длинной стороне уменьшаются, EXIF удаляется.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40 * 1000 * 1000
+MAX_IMAGE_SIDE = 2560
+
 STATIC_URL = '/static/'
 
 # if settings.DEBUG:
@@ -126,11 +143,126 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 P_PER_L = 10
 
+# Наибольшее число элементов навигации по номерам страниц (с пропусками):
+# первая и последняя страницы и окно вокруг текущей, сколько бы их ни было
+PAGE_LINKS = 11
+
+# Длина отрывка поста (символов), отрисованного вместе с HTML текста
+POST_EXCERPT_LENGTH = 300
+
+# Комментариев на странице поста; следующие подгружаются фрагментами
+COMMENTS_PER_PAGE = 20
+
+# Ответы лент и страниц постов несут ETag/Last-Modified из поколений кеша.
+# Анонимные ответы публичные: обратный прокси может хранить их столько
+# секунд, а потом перепроверять (If-None-Match -> 304 без рендера).
+PUBLIC_CACHE_MAX_AGE = 0
+
+# Срок хранения готовых страниц лент для анонимных пользователей
+# (AnonymousPageCacheMiddleware; 0 - выключено). Изменения содержимого
+# видны сразу: ключ страницы включает поколения кеша.
+ANONYMOUS_CACHE_TIMEOUT = 300
+
+# Страницы и фрагменты с курсором из запроса кешируются до смены поколения,
+# но не дольше стольких секунд: записи устаревших поколений и случайных
+# курсоров не копятся в общем кеше бессрочно.
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Число постов в больших лентах оценивается без COUNT(*) на каждый запрос
+# (EstimatedPaginator): по счётчикам групп и авторов, а для главной - по
+# кешу, который пересчитывается в фоне не чаще раза в COUNT_REFRESH_INTERVAL
+# секунд. Оценки меньше EXACT_COUNT_BELOW заменяются точным COUNT(*).
+COUNT_REFRESH_INTERVAL = 60
+EXACT_COUNT_BELOW = 1000
+
+# Курсорная (keyset) пагинация лент вместо постраничной
+CURSOR_PAGINATION = False
+
+# Авторы с большим числом подписчиков не раскладываются по лентам
+# при публикации, их посты подмешиваются в ленту при чтении.
+# Раскладка выключается при числе подписчиков больше
+# FANOUT_FOLLOWERS_LIMIT и снова включается не больше чем при
+# FANOUT_RESUME_LIMIT; ленты перестраиваются в фоновом потоке
+FANOUT_FOLLOWERS_LIMIT = 1000
+FANOUT_RESUME_LIMIT = 800
+
+# Поиск: индекс SQLite FTS5, если он доступен, иначе таблица SearchTerm.
+# После смены индекса: python manage.py rebuild_search_index
+SEARCH_USE_FTS5 = True
+
+# Доля запросов, для которых MetricsMiddleware собирает время, запросы
+# к БД, обращения к кешу и время рендера (0 - выключено, 1 - все).
+# Гистограммы по представлениям отдаются персоналу на /metrics/
+# в формате Prometheus.
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '0'))
+
+# Профилирование медленных запросов: снимки стека раз в PROFILING_INTERVAL
+# секунд для запросов с заголовком X-Profile: PROFILING_TOKEN (пустой токен
+# отключает заголовок) и доли PROFILING_SAMPLE_RATE остальных. Стеки
+# запросов дольше PROFILING_THRESHOLD секунд пишутся в PROFILING_DIR
+# в формате flamegraph.pl/speedscope, хранятся последние PROFILING_MAX_FILES.
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_THRESHOLD = float(os.getenv('PROFILING_THRESHOLD', '0.5'))
+PROFILING_INTERVAL = 0.005
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_MAX_FILES = 100
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Миниатюры картинок постов: набор ширин с пропорциями POST_IMAGE_SIZE
+# в каждом формате, который поддерживает установленный Pillow (AVIF нужен
+# плагин pillow-avif-plugin). JPEG обязателен - это запасной вариант.
+# Генерируются фоновыми потоками сразу после сохранения поста.
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+POST_IMAGE_OPTIONS = {'crop': 'center', 'upscale': True}
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_BACKEND = 'posts.thumbnails.RenditionBackend'
+THUMBNAIL_KVSTORE = 'posts.thumbnails.CachedDBKVStore'
+
+# Общий для всех процессов кеш (L2). По умолчанию FileBasedCache
+# в BASE_DIR/cache - его видят все воркеры на одной машине, но add и incr
+# у него не атомарны. При нескольких машинах или высокой нагрузке нужен
+# бэкенд с атомарными add и incr (блокировка от stampede и поколения
+# кеша), например:
+# SHARED_CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+# SHARED_CACHE_LOCATION=127.0.0.1:11211
+# Тесты запускаются с LocMemCache (core.test_runner.TEST_CACHES).
+SHARED_CACHE_BACKEND = os.getenv(
+    'SHARED_CACHE_BACKEND',
+    'django.core.cache.backends.filebased.FileBasedCache'
+)
+SHARED_CACHE_LOCATION = os.getenv(
+    'SHARED_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+)
+# Ограничение числа файлов FileBasedCache (по умолчанию у Django - 300)
+SHARED_CACHE_OPTIONS = (
+    {'MAX_ENTRIES': 10000} if SHARED_CACHE_BACKEND.endswith('FileBasedCache')
+    else {}
+)
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        # 'LOCATION': 'index_page',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'L1_MAX_ENTRIES': 1000,
+            'L1_MAX_BYTES': 16 * 1024 * 1024,
+            'L1_TIMEOUT': 60,
+            'L1_BYPASS_PREFIXES': (
+                'generation:', 'lock:', 'following:', 'count:'
+            ),
+            'LOCK_TIMEOUT': 5,
+        },
+    },
+    'shared': {
+        'BACKEND': SHARED_CACHE_BACKEND,
+        'LOCATION': SHARED_CACHE_LOCATION,
+        'TIMEOUT': None,
+        'OPTIONS': SHARED_CACHE_OPTIONS,
+    },
 }
+
+TEST_RUNNER = 'core.test_runner.TestRunner'